@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import multiprocessing
+import pc_rooms
+from pc_data import setup_logging
+
+# Batch runs of assign-pc-rooms.py. A manifest lists scenarios (input files,
+# trial counts, seeds and trial options), and all their trials run on one
+# shared process pool, so the machine stays busy until the whole batch is
+# done rather than idling at the end of every run. Each input file is read
+# and turned into a graph once, however many scenarios use it. Every scenario
+# writes its people-rooms.csv and paper-rooms.csv to its own directory under
+# the output directory as soon as its last trial is in, and the batch ends
+# with a summary table of cut cost, plenary size and room balance (also
+# written as summary.csv).
+#
+# The manifest is JSON: a list of scenarios, or an object with "scenarios"
+# and "defaults" (keys every scenario gets unless it sets them):
+#
+#   {"defaults": {"trials": 1000, "seed": 1},
+#    "scenarios": [{"name": "2023", "input": "papers-2023.csv"},
+#                  {"name": "2023-3rounds", "input": "papers-2023.csv", "rounds": 3},
+#                  {"input": "mock.csv", "trials": 5000, "engine": "multilevel"}]}
+#
+# A scenario with "third": true keeps the Second Secondary reviewer of each
+# paper in its room too (as assign-pc-rooms.py --third).
+
+logger = logging.getLogger(__name__)
+
+SCENARIO_KEYS = ['name', 'input', 'trials', 'seed', 'third'] + list(pc_rooms.DEFAULT_TRIAL_OPTIONS)
+SUMMARY_FIELDS = ['name', 'input', 'trials', 'seed', 'reviewers', 'papers', 'cost', 'plenary', 'room_sizes',
+                  'imbalance', 'excess', 'status']
+
+# Returns the scenarios of a manifest, each with all of SCENARIO_KEYS but the
+# trial options, which are gathered in its 'options'.
+def read_manifest(fname):
+    with open(fname) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {'scenarios': manifest}
+    defaults = manifest.get('defaults', {})
+    manifest_dir = os.path.dirname(os.path.abspath(fname))
+    scenarios = []
+    names = set()
+    for i, entry in enumerate(manifest.get('scenarios', [])):
+        entry = dict(defaults, **entry)
+        unknown = [key for key in entry if key not in SCENARIO_KEYS]
+        if unknown:
+            sys.exit(f'{fname}: scenario {i} has unknown keys {", ".join(unknown)}')
+        if 'input' not in entry:
+            sys.exit(f'{fname}: scenario {i} has no input file')
+        scenario = {
+            'input': os.path.join(manifest_dir, entry['input']), # relative to the manifest
+            'trials': entry.get('trials', 1000),
+            'seed': entry.get('seed', random.randrange(pc_rooms.MAX_SEED)),
+            'third': bool(entry.get('third', False)),
+            'options': pc_rooms.get_trial_options({key: entry[key] for key in pc_rooms.DEFAULT_TRIAL_OPTIONS
+                                                   if key in entry}),
+        }
+        input_name = os.path.splitext(os.path.basename(entry['input']))[0]
+        scenario['name'] = str(entry.get('name', f'{input_name}-{scenario["trials"]}'))
+        if scenario['name'] in names or os.sep in scenario['name']:
+            sys.exit(f'{fname}: scenario name {scenario["name"]!r} is repeated or not a plain directory name')
+        if scenario['options']['rounds'] != 2 and scenario['options']['balancer'] != 'flow':
+            sys.exit(f'{fname}: scenario {scenario["name"]} needs the flow balancer for other than two rounds')
+        names.add(scenario['name'])
+        scenarios.append(scenario)
+    if not scenarios:
+        sys.exit(f'{fname} has no scenarios')
+    return scenarios
+
+# Reads every input file once (or twice, if it is used both with and without
+# third reviewers), and sets up each scenario's trial state.
+def load_scenarios(scenarios):
+    inputs = {}
+    for scenario in scenarios:
+        key = (scenario['input'], scenario['third'])
+        if key not in inputs:
+            logger.info(f'Reading {key[0]} ...')
+            reviewers, papers, singles = pc_rooms.read_assignments(*key)
+            inputs[key] = (reviewers, papers, singles, pc_rooms.make_graph_from_paper_reviews(reviewers, papers))
+        reviewers, papers, singles, graph = inputs[key]
+        options = scenario['options']
+        pc_rooms.prepare_graph_for_trials(graph, options)
+        scenario['singles'] = singles
+        scenario['state'] = pc_rooms.make_trial_state(graph, reviewers, papers, scenario['seed'],
+                                                      multiprocessing.Value('l', pc_rooms.BIG_COST), options)
+        scenario['best'] = None
+        scenario['counters'] = pc_rooms.new_trial_counters()
+        scenario['done'] = 0
+
+# Every scenario's chunks of trials, biggest scenarios (by papers times trials)
+# first, so that the small chunks at the end keep all workers busy.
+def generate_batch_tasks(scenarios, workers):
+    order = sorted(scenarios, key=lambda s: -len(s['state']['papers']) * s['trials'])
+    for scenario in order:
+        chunk_size = pc_rooms.get_trial_chunk_size(scenario['trials'], workers, scenario['options'])
+        for trial_range in pc_rooms.generate_trial_chunks(scenario['trials'], chunk_size):
+            yield scenario['name'], trial_range
+
+# Writes a finished scenario's rooms to its directory, and returns its row of
+# the summary table.
+def finish_scenario(scenario, out_dir):
+    state = scenario['state']
+    reviewers, papers, graph = state['reviewers'], state['papers'], state['graph']
+    row = {'name': scenario['name'], 'input': scenario['input'], 'trials': scenario['trials'],
+           'seed': scenario['seed'], 'reviewers': len(reviewers), 'papers': len(papers),
+           'cost': None, 'plenary': None, 'room_sizes': None, 'imbalance': None, 'excess': None, 'status': 'failed'}
+    best = scenario['best']
+    if not best:
+        logger.warning(f'{scenario["name"]}: no trial met the room caps')
+        return row
+    cut_cost, excess, i, seed, partitions, paper_rooms = best
+    reviewer_rooms = pc_rooms.get_reviewer_rooms(partitions)
+    pids_in_cut = pc_rooms.get_papers_in_graph_cut(graph, partitions[-1][2])
+    paper_rooms = [list(room) for room in paper_rooms] # singles are added to a copy
+    rooms_by_person, summary = pc_rooms.complete_room_assignments(reviewers, papers, scenario['singles'],
+                                                                  reviewer_rooms, paper_rooms, pids_in_cut)
+    scenario_dir = os.path.join(out_dir, scenario['name'])
+    os.makedirs(scenario_dir, exist_ok=True)
+    pc_rooms.write_people_rooms_file(rooms_by_person, os.path.join(scenario_dir, 'people-rooms.csv'))
+    pc_rooms.write_paper_rooms_file(paper_rooms, pids_in_cut, os.path.join(scenario_dir, 'paper-rooms.csv'))
+    sizes = [len(room) for room in paper_rooms]
+    row.update({'cost': cut_cost, 'plenary': len(pids_in_cut), 'room_sizes': sizes,
+                'imbalance': max(sizes) - min(sizes), 'excess': excess,
+                'status': 'ok' if summary['ok'] else 'invalid'})
+    return row
+
+def run_batch(scenarios, workers, out_dir):
+    by_name = {scenario['name']: scenario for scenario in scenarios}
+    states = {scenario['name']: scenario['state'] for scenario in scenarios}
+    tasks = generate_batch_tasks(scenarios, workers)
+    pool = None
+    if workers == 1:
+        pc_rooms.init_batch_worker(states, pool=False)
+        results = map(pc_rooms.run_batch_chunk, tasks)
+    else:
+        pool = multiprocessing.Pool(workers, initializer=pc_rooms.init_batch_worker, initargs=(states,))
+        results = pc_rooms.imap_unordered_bounded(pool, pc_rooms.run_batch_chunk, tasks, 2 * workers)
+    rows = {}
+    try:
+        for name, (result, chunk_counters, trial_range, records) in results:
+            scenario = by_name[name]
+            pc_rooms.add_trial_counters(scenario['counters'], chunk_counters)
+            scenario['done'] += len(trial_range)
+            if result and pc_rooms.is_better_trial(result, scenario['best']):
+                scenario['best'] = result
+            if scenario['done'] == scenario['trials']:
+                logger.info(f'{name}: finished {scenario["trials"]} trials')
+                rows[name] = finish_scenario(scenario, out_dir)
+    except KeyboardInterrupt:
+        logger.warning('Interrupted -- writing the best results so far.')
+    finally:
+        if pool:
+            pool.terminate()
+    for scenario in scenarios: # those cut short
+        if scenario['name'] not in rows:
+            rows[scenario['name']] = finish_scenario(scenario, out_dir)
+            rows[scenario['name']]['status'] += ' (interrupted)'
+    return [rows[scenario['name']] for scenario in scenarios]
+
+def format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ' '.join(str(v) for v in value)
+    return str(value)
+
+def print_summary(rows):
+    fields = [field for field in SUMMARY_FIELDS if field != 'input']
+    table = [fields] + [[format_value(row[field]) for field in fields] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(fields))]
+    for line in table:
+        print('  '.join(value.rjust(width) for value, width in zip(line, widths)))
+
+def write_summary_file(fname, rows):
+    lines = ','.join(SUMMARY_FIELDS) + '\n'
+    for row in rows:
+        lines += ','.join(format_value(row[field]) for field in SUMMARY_FIELDS) + '\n'
+    logger.info(f'writing {fname}')
+    with open(fname, 'w') as f:
+        f.write(lines)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run assign-pc-rooms.py on a batch of scenarios with one worker pool.')
+    parser.add_argument('manifest', help='JSON manifest of scenarios (see batch-pc-rooms.py)')
+    parser.add_argument('--workers', type=int, default=0, help='worker processes shared by all scenarios (0 = one per core, default 0)')
+    parser.add_argument('--output-dir', default='batch-rooms', help='directory for the scenario directories and summary.csv (default batch-rooms)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    setup_logging()
+    scenarios = read_manifest(args.manifest)
+    load_scenarios(scenarios)
+    workers = pc_rooms.get_worker_count(args.workers)
+    total = sum(scenario['trials'] for scenario in scenarios)
+    logger.info(f'About to run {total} trials of {len(scenarios)} scenarios ({workers} workers) ...')
+    os.makedirs(args.output_dir, exist_ok=True)
+    start = time.time()
+    rows = pc_rooms.exit_on_rooms_error(run_batch, scenarios, workers, args.output_dir)
+    logger.info(f'Ran the batch in {time.time() - start:.1f} seconds.')
+    print_summary(rows)
+    write_summary_file(os.path.join(args.output_dir, 'summary.csv'), rows)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import math
+import random
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+
+# Scale benchmarks for assign-pc-rooms.py. The run command sweeps fake inputs
+# from gen-fake-data.py over paper counts and densities (reviews per reviewer),
+# runs the pipeline on each with a fixed seed, and writes a JSON file of wall
+# times, peak memory, Z-cut cost and room imbalance. The compare command checks
+# a new results file against a baseline and flags regressions in speed, memory
+# or solution quality. The scaling command times just the classification of
+# papers into the nine categories, for paper counts up to 100k, and reports how
+# fast that time grows with the number of papers.
+#
+# Each configuration runs in its own process (the run-one command), so that
+# its peak memory is its own.
+
+BENCH_VERSION = 1
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def get_config_name(config):
+    return f'{config["papers"]}p-{config["reviewers"]}r'
+
+def make_configs(paper_counts, densities):
+    configs = []
+    for n_papers in paper_counts:
+        for density in densities:
+            n_reviewers = max(4, round(2 * n_papers / density)) # every paper has two reviewers
+            configs.append({'papers': n_papers, 'reviewers': n_reviewers, 'density': density})
+    return configs
+
+# Runs the pipeline stages in this process and returns their metrics. The
+# pipeline's own log goes to stderr, so stdout holds only the result.
+def run_one(data_file, trials, seed, engine):
+    sys.path.insert(0, SCRIPT_DIR)
+    import pc_data
+    import pc_rooms
+    times = {}
+    pc_data.setup_logging(stream=sys.stderr)
+    start = time.perf_counter()
+    reviewers, papers, singles = pc_rooms.read_assignments(data_file)
+    times['read'] = time.perf_counter() - start
+    start = time.perf_counter()
+    graph = pc_rooms.make_graph_from_paper_reviews(reviewers, papers)
+    times['graph'] = time.perf_counter() - start
+    start = time.perf_counter()
+    metrics = {}
+    rooms = pc_rooms.assign_rooms(graph, reviewers, papers, trials, seed, options={'engine': engine},
+                                  metrics=metrics)
+    times['trials'] = time.perf_counter() - start
+    result = {'cost': None, 'room_sizes': None, 'imbalance': None}
+    if rooms:
+        reviewer_rooms, paper_rooms, pids_in_cut = rooms
+        start = time.perf_counter()
+        rooms_by_person, summary = pc_rooms.complete_room_assignments(reviewers, papers, singles, reviewer_rooms,
+                                                                      paper_rooms, pids_in_cut)
+        times['complete'] = time.perf_counter() - start
+        sizes = [len(room) for room in paper_rooms]
+        result = {'cost': len(pids_in_cut), 'room_sizes': sizes,
+                  'imbalance': max(sizes) - min(sizes)}
+    counters = metrics['counters']
+    result.update({
+        'seconds': round(sum(times.values()), 3),
+        'stage_seconds': {stage: round(t, 3) for stage, t in times.items()},
+        'trial_stage_seconds': {stage: round(counters['time_' + stage], 3) for stage in pc_rooms.TRIAL_STAGES},
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, # kilobytes on Linux
+        'counters': {key: counters[key] for key in pc_rooms.TRIAL_COUNTERS},
+    })
+    return result
+
+def generate_data(config, fname, seed):
+    command = [sys.executable, os.path.join(SCRIPT_DIR, 'gen-fake-data.py'),
+               str(config['papers']), str(config['reviewers']), fname, str(seed)]
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+def run_config(config, args, work_dir):
+    data_file = os.path.join(work_dir, get_config_name(config) + '.csv')
+    start = time.perf_counter()
+    generate_data(config, data_file, args.seed)
+    generate_seconds = time.perf_counter() - start
+    command = [sys.executable, os.path.abspath(__file__), 'run-one', data_file,
+               '--trials', str(args.trials), '--seed', str(args.seed), '--engine', args.engine]
+    stderr = None if args.verbose else subprocess.DEVNULL
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=stderr, text=True).stdout
+    result = dict(config, name=get_config_name(config), generate_seconds=round(generate_seconds, 3))
+    result.update(json.loads(output))
+    os.remove(data_file)
+    return result
+
+def print_result(result):
+    print(f'{result["name"]:>16}: {result["seconds"]:8.2f}s {result["max_rss_kb"] // 1024:6d} MB '
+          f'cost {result["cost"]} imbalance {result["imbalance"]}')
+
+def run_benchmarks(args):
+    configs = make_configs(args.papers, args.density)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for config in configs:
+            result = run_config(config, args, work_dir)
+            print_result(result)
+            results.append(result)
+    bench = {
+        'version': BENCH_VERSION,
+        'trials': args.trials,
+        'seed': args.seed,
+        'engine': args.engine,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(bench, f, indent=1)
+    print(f'writing {args.output}')
+
+# Best-of-repeats time of classifying the papers of data_file, after one
+# trial's two bisections, in seconds.
+def time_classify(data_file, seed, repeats):
+    sys.path.insert(0, SCRIPT_DIR)
+    import pc_rooms
+    reviewers, papers, singles = pc_rooms.read_assignments(data_file)
+    graph = pc_rooms.make_graph_from_paper_reviews(reviewers, papers)
+    rng = random.Random(seed)
+    partition1 = pc_rooms.partition_graph(graph, rng)
+    partition2 = pc_rooms.partition_graph(pc_rooms.make_subgraph_from_cut(graph, partition1), rng)
+    pc_rooms.assign_people_missing_from_XY(reviewers, partition2, rng)
+    best = None
+    for i in range(repeats):
+        start = time.perf_counter()
+        pc_rooms.classify_papers_ABCXYZ(papers, partition1, partition2)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+# The growth exponent between successive paper counts is the slope of log time
+# against log papers: about 1 if classifying is linear, 2 if quadratic.
+def run_scaling(args):
+    configs = make_configs(args.papers, [args.density])
+    previous = None
+    with tempfile.TemporaryDirectory() as work_dir:
+        for config in configs:
+            data_file = os.path.join(work_dir, get_config_name(config) + '.csv')
+            generate_data(config, data_file, args.seed)
+            seconds = time_classify(data_file, args.seed, args.repeats)
+            os.remove(data_file)
+            growth = ''
+            if previous:
+                growth = f' (growth exponent {math.log(seconds / previous[1]) / math.log(config["papers"] / previous[0]):.2f})'
+            print(f'{get_config_name(config):>16}: classify {1000 * seconds:8.2f} ms{growth}')
+            previous = (config['papers'], seconds)
+
+def read_bench_file(fname):
+    with open(fname) as f:
+        bench = json.load(f)
+    if bench.get('version') != BENCH_VERSION:
+        sys.exit(f'{fname} has an unknown version')
+    return bench
+
+# Returns the regressions of new against old for one configuration, as strings.
+def compare_result(old, new, args):
+    regressions = []
+    if new['cost'] is None and old['cost'] is not None:
+        return ['no feasible assignment']
+    if new['cost'] is not None and old['cost'] is not None:
+        if new['cost'] > old['cost'] * (1 + args.cost_tolerance):
+            regressions.append(f'cost {old["cost"]} -> {new["cost"]}')
+        if new['imbalance'] > old['imbalance'] + args.imbalance_tolerance:
+            regressions.append(f'imbalance {old["imbalance"]} -> {new["imbalance"]}')
+    if new['seconds'] > old['seconds'] * (1 + args.time_tolerance) and new['seconds'] - old['seconds'] > args.min_seconds:
+        regressions.append(f'time {old["seconds"]:.2f}s -> {new["seconds"]:.2f}s')
+    if new['max_rss_kb'] > old['max_rss_kb'] * (1 + args.memory_tolerance):
+        regressions.append(f'memory {old["max_rss_kb"] // 1024} MB -> {new["max_rss_kb"] // 1024} MB')
+    return regressions
+
+def compare_benchmarks(args):
+    old_bench = read_bench_file(args.baseline)
+    new_bench = read_bench_file(args.results)
+    for key in ['trials', 'seed', 'engine']:
+        if old_bench[key] != new_bench[key]:
+            print(f'Warning: {key} differs ({old_bench[key]} vs {new_bench[key]}), so results are not comparable.')
+    old_results = {result['name']: result for result in old_bench['results']}
+    n_regressions = 0
+    for new in new_bench['results']:
+        old = old_results.get(new['name'])
+        if not old:
+            print(f'{new["name"]:>16}: not in baseline')
+            continue
+        regressions = compare_result(old, new, args)
+        speedup = old['seconds'] / new['seconds'] if new['seconds'] else 0
+        status = 'REGRESSION: ' + ', '.join(regressions) if regressions else 'ok'
+        print(f'{new["name"]:>16}: {old["seconds"]:8.2f}s -> {new["seconds"]:8.2f}s ({speedup:.2f}x), '
+              f'cost {old["cost"]} -> {new["cost"]}: {status}')
+        n_regressions += bool(regressions)
+    if n_regressions:
+        print(f'{n_regressions} configurations regressed.')
+        sys.exit(1)
+    print('No regressions.')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark assign-pc-rooms.py on fake data of increasing size.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='run the benchmark sweep and write a results file')
+    run.add_argument('--papers', type=int, nargs='+', default=[1000, 10000, 100000], help='paper counts to sweep (default 1000 10000 100000)')
+    run.add_argument('--density', type=int, nargs='+', default=[10, 20, 40], help='reviews per reviewer to sweep (default 10 20 40)')
+    run.add_argument('--trials', type=int, default=20, help='trials per configuration (default 20)')
+    run.add_argument('--seed', type=int, default=1, help='seed for the fake data and the trials (default 1)')
+    run.add_argument('--engine', default='csr', help='graph bisection engine (default csr)')
+    run.add_argument('--output', default='bench-results.json', help='results file (default bench-results.json)')
+    run.add_argument('--verbose', action='store_true', help='show the output of each run')
+    scaling = commands.add_parser('scaling', help='time the classification of papers for growing paper counts')
+    scaling.add_argument('--papers', type=int, nargs='+', default=[1000, 10000, 100000], help='paper counts to sweep (default 1000 10000 100000)')
+    scaling.add_argument('--density', type=int, default=20, help='reviews per reviewer (default 20)')
+    scaling.add_argument('--repeats', type=int, default=5, help='classifications timed per paper count, keeping the fastest (default 5)')
+    scaling.add_argument('--seed', type=int, default=1, help='seed for the fake data and the bisections (default 1)')
+    compare = commands.add_parser('compare', help='compare a results file against a baseline')
+    compare.add_argument('baseline', help='baseline results file')
+    compare.add_argument('results', help='new results file')
+    compare.add_argument('--time-tolerance', type=float, default=0.2, help='allowed relative slowdown (default 0.2)')
+    compare.add_argument('--min-seconds', type=float, default=0.5, help='ignore slowdowns smaller than this (default 0.5)')
+    compare.add_argument('--memory-tolerance', type=float, default=0.2, help='allowed relative growth of peak memory (default 0.2)')
+    compare.add_argument('--cost-tolerance', type=float, default=0.0, help='allowed relative growth of the Z-cut cost (default 0)')
+    compare.add_argument('--imbalance-tolerance', type=int, default=0, help='allowed growth of room imbalance in papers (default 0)')
+    one = commands.add_parser('run-one', help=argparse.SUPPRESS)
+    one.add_argument('data_file')
+    one.add_argument('--trials', type=int, default=20)
+    one.add_argument('--seed', type=int, default=1)
+    one.add_argument('--engine', default='csr')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.command == 'run':
+        run_benchmarks(args)
+    elif args.command == 'scaling':
+        run_scaling(args)
+    elif args.command == 'compare':
+        compare_benchmarks(args)
+    else:
+        print(json.dumps(run_one(args.data_file, args.trials, args.seed, args.engine)))
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,94 @@
-import sys
 import random
+import argparse
 
-def get_array_indices_matching_given_val(arr, val):
-    return [i for i, arr_val in enumerate(arr) if arr_val == val]
-
-def assign_random_reviewer_among_min_count(counts):
-    min_count = min(counts)
-    indices = get_array_indices_matching_given_val(counts, min_count)
-    index = random.choice(indices)
-    counts[index] += 1 # this person's review count just went up by one
-    return index
-
-def get_reviewers(n_papers, n_people, fname):
-    with open(fname, 'w') as f:
-        line = 'Submission ID,Withdrawn,Primary,Secondary,Second Secondary\n'
-        f.write(line)
-        counts = [0 for i in range(n_people)]
-        for i in range(n_papers):
-            r1 = assign_random_reviewer_among_min_count(counts)
-            r2 = assign_random_reviewer_among_min_count(counts)
-            line = f'p{i},False,r{r1},r{r2},\n'
-            f.write(line)
-    print(f'wrote {fname} with reviewer counts: {counts}')
+WRITE_ROWS = 65536 # rows per buffered write
+
+# Reviewers are dealt to papers least-loaded first, as if from a deck of cards:
+# a deck holds a shuffled copy of a group of reviewers and is dealt from the
+# end, and a fresh shuffle goes under it when it runs out. So every reviewer in
+# a group gets one more paper before any gets two more, and each deal is O(1)
+# rather than a scan of every reviewer's count.
+def make_deck(group):
+    return {'group': group, 'cards': []}
+
+def deal_reviewer(deck, on_paper, rng):
+    cards = deck['cards']
+    if len(cards) <= len(on_paper): # make sure a reviewer not on this paper is left
+        refill = list(deck['group'])
+        rng.shuffle(refill)
+        cards[:0] = refill
+    k = len(cards) - 1
+    while cards[k] in on_paper: # at most len(on_paper) steps
+        k -= 1
+    cards[k], cards[-1] = cards[-1], cards[k]
+    return cards.pop()
+
+# Splits the reviewers into n_clusters topical clusters of (nearly) equal size.
+def make_clusters(n_people, n_clusters):
+    n_clusters = max(1, min(n_clusters, n_people // 3))
+    return [list(range(c, n_people, n_clusters)) for c in range(n_clusters)]
+
+# Reviewers for one paper: the primary comes from the paper's cluster, and each
+# other reviewer too with probability affinity, otherwise from another cluster.
+def deal_paper_reviewers(decks, n_reviewers, affinity, rng):
+    cluster = rng.randrange(len(decks))
+    revs = []
+    for i in range(n_reviewers):
+        deck = decks[cluster]
+        if i and len(decks) > 1 and rng.random() >= affinity:
+            other = rng.randrange(len(decks) - 1)
+            deck = decks[other + (other >= cluster)]
+        revs.append(deal_reviewer(deck, revs, rng))
+    return revs
+
+def make_paper_row(i, args, decks, counts, rng):
+    if rng.random() < args.singles:
+        n_reviewers = 1
+    elif rng.random() < args.third:
+        n_reviewers = 3
+    else:
+        n_reviewers = 2
+    revs = deal_paper_reviewers(decks, n_reviewers, args.affinity, rng)
+    for r in revs:
+        counts[r] += 1
+    withdrawn = rng.random() < args.withdrawn
+    names = [f'r{r}' for r in revs] + [''] * (3 - len(revs))
+    return f'p{i},{withdrawn},{names[0]},{names[1]},{names[2]}\n'
+
+def get_reviewers(args):
+    rng = random.Random(args.seed)
+    decks = [make_deck(cluster) for cluster in make_clusters(args.n_people, args.clusters)]
+    counts = [0] * args.n_people
+    with open(args.fname, 'w') as f:
+        f.write('Submission ID,Withdrawn,Primary,Secondary,Second Secondary\n')
+        rows = []
+        for i in range(args.n_papers):
+            rows.append(make_paper_row(i, args, decks, counts, rng))
+            if len(rows) == WRITE_ROWS:
+                f.write(''.join(rows))
+                rows = []
+        f.write(''.join(rows))
+    print(f'wrote {args.fname} with {args.n_papers} papers and reviewer counts from {min(counts)} to {max(counts)}')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate fake SIGGRAPH PC paper assignments.')
+    parser.add_argument('n_papers', nargs='?', type=int, default=1000, help='number of papers (default 1000)')
+    parser.add_argument('n_people', nargs='?', type=int, default=100, help='number of reviewers (default 100)')
+    parser.add_argument('fname', nargs='?', default='fake-data.csv', help='output CSV file (default fake-data.csv)')
+    parser.add_argument('seed', nargs='?', type=int, help='random seed; same seed, same data (default random)')
+    parser.add_argument('--clusters', type=int, default=1, help='topical clusters of reviewers (default 1, no clusters)')
+    parser.add_argument('--affinity', type=float, default=0.8,
+                        help='chance that each other reviewer of a paper is from its primary\'s cluster (default 0.8)')
+    parser.add_argument('--third', type=float, default=0.0, help='fraction of papers with a Second Secondary reviewer (default 0)')
+    parser.add_argument('--singles', type=float, default=0.0, help='fraction of papers with only one reviewer (default 0)')
+    parser.add_argument('--withdrawn', type=float, default=0.0, help='fraction of papers marked withdrawn (default 0)')
+    args = parser.parse_args()
+    if args.n_people < 3:
+        parser.error('need at least 3 reviewers')
+    return args
 
 def main():
-    n_papers = 1000
-    n_people = 100
-    fname = 'fake-data.csv'
-    if len(sys.argv) > 1:
-        n_papers = int(sys.argv[1])
-    if len(sys.argv) > 2:
-        n_people = int(sys.argv[2])
-    if len(sys.argv) > 3:
-        fname = sys.argv[3]
-    get_reviewers(n_papers, n_people, fname)
-
-main()
\ No newline at end of file
+    get_reviewers(parse_args())
+
+if __name__ == '__main__':
+    main()
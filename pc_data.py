@@ -0,0 +1,83 @@
+import sys
+import csv
+import logging
+
+# Readers for the CSV files shared by assign-pc-rooms.py and
+# verify-room-assignments.py. Rows are parsed lazily with the csv module (so
+# quoted fields work), one at a time, and bad rows are collected as problems
+# rather than stopping the read. A problem is a (line number, message) tuple.
+#
+# The modules report progress through logging (the 'pc_rooms', 'pc_data' and
+# so on loggers), not print, so they stay quiet when used in-process. The
+# scripts call setup_logging to show it on stdout.
+
+logger = logging.getLogger(__name__)
+
+def setup_logging(verbose=True, stream=None):
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING, format='%(message)s',
+                        stream=stream or sys.stdout)
+
+# Input CSV file (as exported by Linklings) has this header/format:
+# Submission ID,Withdrawn,Primary,Secondary,Second Secondary
+PAPER_HEADER = ['Submission ID', 'Withdrawn', 'Primary', 'Secondary', 'Second Secondary']
+
+WITHDRAWN_VALUES = {'true': True, 'yes': True, '1': True, 'false': False, 'no': False, '0': False, '': False}
+
+MAX_PRINTED_PROBLEMS = 10
+
+# Yields (line number, row) for each non-blank row after the header, with the
+# fields stripped of surrounding whitespace.
+def read_csv_rows(fname):
+    with open(fname, newline='') as f:
+        reader = csv.reader(f, skipinitialspace=True)
+        next(reader, None) # skip header
+        for row in reader:
+            row = [item.strip() for item in row]
+            if any(row):
+                yield reader.line_num, row
+
+# Yields (pid, withdrawn, revs) for each paper, where revs is a tuple of its
+# (up to three) non-blank reviewers in column order. Reviewer names are
+# interned as they are read, so every paper of a reviewer shares one string
+# and memory grows with the number of distinct reviewers, not the file size.
+def read_paper_rows(fname, problems=None):
+    if problems is None:
+        problems = []
+    names = {}
+    for line, row in read_csv_rows(fname):
+        if len(row) < 4:
+            problems.append((line, f'expected at least 4 fields but found {len(row)}'))
+            continue
+        pid, withdrawn = row[:2]
+        if not pid:
+            problems.append((line, 'missing Submission ID'))
+            continue
+        if withdrawn.lower() not in WITHDRAWN_VALUES:
+            problems.append((line, f'paper {pid} has unknown Withdrawn value {withdrawn!r}'))
+            continue
+        if len(row) > len(PAPER_HEADER) and any(row[len(PAPER_HEADER):]):
+            problems.append((line, f'paper {pid} has extra fields (ignored)'))
+        revs = tuple(names.setdefault(r, r) for r in row[2:len(PAPER_HEADER)] if r)
+        if len(set(revs)) < len(revs):
+            problems.append((line, f'paper {pid} lists the same reviewer twice (ignored the repeat)'))
+            revs = tuple(dict.fromkeys(revs))
+        yield pid, WITHDRAWN_VALUES[withdrawn.lower()], revs
+
+# Yields (item, room) for each row of a paper-rooms.csv or people-rooms.csv file.
+def read_rooms_rows(fname, problems=None):
+    if problems is None:
+        problems = []
+    for line, row in read_csv_rows(fname):
+        if len(row) < 2 or not row[0] or not row[1]:
+            problems.append((line, 'expected an item and a room'))
+            continue
+        yield row[0], row[1]
+
+def log_problems(fname, problems):
+    if not problems:
+        return
+    logger.warning(f'Found {len(problems)} bad rows in {fname}:')
+    for line, msg in problems[:MAX_PRINTED_PROBLEMS]:
+        logger.warning(f'-- line {line}: {msg}')
+    if len(problems) > MAX_PRINTED_PROBLEMS:
+        logger.warning(f'-- ... and {len(problems) - MAX_PRINTED_PROBLEMS} more')
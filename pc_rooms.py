@@ -0,0 +1,2310 @@
+# Library behind assign-pc-rooms.py (see README.md). Each stage of the
+# pipeline takes and returns in-memory structures, so it can be called
+# in-process:
+#
+#   reviewers, papers, singles = read_assignments(fname)   # or make_assignments(rows); third=True for 3 reviewers
+#   graph = make_graph_from_paper_reviews(reviewers, papers)
+#   reviewer_rooms, paper_rooms, pids_in_cut = assign_rooms(graph, reviewers, papers, num_trials, seed)
+#   rooms_by_person, summary = complete_room_assignments(reviewers, papers, singles,
+#                                                        reviewer_rooms, paper_rooms, pids_in_cut)
+#
+# Importing it has no side effects, and networkx and pysat are only imported
+# when their engines (--engine networkx, --balancer sat) are used.
+
+import os
+import sys
+import json
+import math
+import hashlib
+import time
+import queue
+import random
+import signal
+import logging
+import argparse
+import multiprocessing
+from collections import Counter
+from array import array
+from pc_data import read_paper_rows, read_rooms_rows, log_problems, setup_logging
+from pc_verify import ROUND_ROOM_LABELS, verify_room_assignments, print_verify_report, exit_on_violations
+
+# GLOBAL VARIABLES -- see README.md for meaning of these rooms
+
+ROOM_LABELS = ['A','B','X','Y']
+
+# With --rounds R (see the R-round engine below), round k puts every reviewer
+# in one of the two rooms ROUND_ROOM_LABELS[k] (from pc_verify), so the first
+# two rounds give the usual A,B and X,Y.
+MAX_ROUNDS = len(ROUND_ROOM_LABELS)
+
+def get_room_labels(n_rooms):
+    return [label for pair in ROUND_ROOM_LABELS for label in pair][:n_rooms]
+
+AX,BX,AY,BY,CX,CY,AZ,BZ,CZ = list(range(9)) # ints 0,1,...8
+CATEGORY_LABELS = ['AX','BX','AY','BY','CX','CY','AZ','BZ','CZ']
+
+''' Category meanings:
+| 0 | AX | in A or X
+| 1 | BX | in B or X
+| 2 | AY | in A or Y
+| 3 | BY | in B or Y
+| 4 | CX | in X
+| 5 | CY | in Y
+| 6 | AZ | in A
+| 7 | BZ | in B
+| 8 | CZ | no room possible
+'''
+#    012345 = code
+LIST_ABCXYZ = [
+    (AX, 0, 3),
+    (BX, 1, 3),
+    (CX, 2, 3),
+    (AY, 0, 4),
+    (BY, 1, 4),
+    (CY, 2, 4),
+    (AZ, 0, 5),
+    (BZ, 1, 5),
+    (CZ, 2, 5)
+]
+
+LIST_OPTIONS = [ 
+    (0,2), # AX, coding for A,B,X,Y = 0,1,2,3
+    (1,2), # BX
+    (0,3), # AY
+    (1,3)  # BY
+]
+
+ONLY_OPTIONS = [9,9,9,9,2,3,0,1,9] # lists 4-7 can specifically only go to X,Y,A,B = 2,3,0,1 (9=None)
+
+BIG_COST = 9999999 # bigger than any cut cost
+MAX_SEED = 2**31
+
+logger = logging.getLogger(__name__)
+
+# Raised for input or runs that cannot go on (e.g. a checkpoint from other
+# input). main reports it and exits with status 1.
+class RoomsError(Exception):
+    pass
+
+def halt_with_error(msg):
+    raise RoomsError(msg)
+
+# Raised when a result breaks an invariant (see validate_trial), which is a bug.
+class InvariantError(RoomsError):
+    pass
+
+# Input CSV file has this header/format (see pc_data.py):
+# Submission ID,Withdrawn,Primary,Secondary,Second Secondary
+# Note: currentlly ignores withdrawn papers or those with <1 reviewer, and
+# partitions papers by their first two reviewers only, unless third is set:
+# then a paper with a Second Secondary has all three reviewers (a hyperedge in
+# the graph below), and can only go to a room all three are in.
+def read_assignments(fname, third=False):
+    problems = []
+    reviewers, papers, singles = make_assignments(read_paper_rows(fname, problems), third)
+    log_problems(fname, problems)
+    return reviewers, papers, singles
+
+# Same as read_assignments, but from rows of (pid, withdrawn, revs) already in
+# memory (as yielded by pc_data.read_paper_rows).
+def make_assignments(rows, third=False):
+    reviewers = {} # dict (not set) so reviewer order follows the input file
+    papers = {}
+    singles = {}
+    third_pids = set()
+    seen = set()
+    for pid, withdrawn, revs in rows:
+        if pid in seen: # the last row wins, even if it drops the paper (withdrawn or no reviewers)
+            logger.warning(f'paper {pid} appears more than once; keeping the last row')
+            papers.pop(pid, None)
+            singles.pop(pid, None)
+            third_pids.discard(pid)
+        seen.add(pid)
+        if withdrawn:
+            continue
+        if len(revs) < 1: # no reviewers
+            logger.warning(f'skipping paper {pid} because no reviewers')
+            continue
+        if len(revs) < 2: # just one reviewer
+            singles[pid] = revs[0]
+            continue
+        if len(revs) > 2:
+            third_pids.add(pid)
+        revs = tuple(revs[:3] if third else revs[:2])
+        for rev in revs:
+            reviewers[rev] = True
+        papers[pid] = revs
+    n_third = len(third_pids)
+    if n_third and third:
+        logger.info(f'-- {n_third} papers have a Second Secondary reviewer, who must be in the same room.')
+    elif n_third:
+        logger.info(f'-- {n_third} papers have a Second Secondary reviewer, who is not used for rooms.')
+    reviewers = list(reviewers)
+    return reviewers, papers, singles
+
+# The reviewer graph, held as flat integer arrays instead of one Python object
+# per edge. Reviewers and papers are interned to dense ids, their positions in
+# graph['reviewers'] and graph['pids']. Edge e joins reviewers src[e] and dst[e]
+# (and third[e], for papers with three reviewers, or else -1), and carries
+# weight[e] papers, whose ids are pid_index[pid_offsets[e]:pid_offsets[e+1]].
+# So a three-reviewer edge is a hyperedge, and it is cut unless all three of
+# its reviewers are in the same room. graph['nodes'] and graph['edges'] list
+# the reviewer and edge ids that are in the graph; a subgraph is a view that
+# shares all the arrays and only has its own two lists (see make_graph_view).
+GRAPH_ARRAYS = ['reviewers', 'index', 'pids', 'src', 'dst', 'third', 'weight', 'pid_offsets', 'pid_index']
+
+def make_graph_from_paper_reviews(reviewers, papers):
+    names = list(reviewers)
+    index = {r: i for i, r in enumerate(names)}
+    pids = list(papers)
+    edge_of = {}
+    src = array('i')
+    dst = array('i')
+    third = array('i')
+    paper_edge = array('i')
+    for pid in pids:
+        revs = papers[pid]
+        u, v = index[revs[0]], index[revs[1]]
+        key = (u, v) if u < v else (v, u)
+        t = -1
+        if len(revs) > 2:
+            u, v, t = key = tuple(sorted((u, v, index[revs[2]])))
+        if key not in edge_of:
+            edge_of[key] = len(src)
+            src.append(u)
+            dst.append(v)
+            third.append(t)
+        paper_edge.append(edge_of[key])
+    # bucket the papers by edge (a counting sort, keeping input order per edge)
+    weight = array('i', [0]) * len(src)
+    for e in paper_edge:
+        weight[e] += 1
+    pid_offsets = array('i', [0])
+    for w in weight:
+        pid_offsets.append(pid_offsets[-1] + w)
+    fill = pid_offsets[:-1]
+    pid_index = array('i', [0]) * len(pids)
+    for p, e in enumerate(paper_edge):
+        pid_index[fill[e]] = p
+        fill[e] += 1
+    graph = {
+        'reviewers': names,
+        'index': index,
+        'pids': pids,
+        'src': src,
+        'dst': dst,
+        'third': third,
+        'weight': weight,
+        'pid_offsets': pid_offsets,
+        'pid_index': pid_index,
+        'nodes': array('i', range(len(names))),
+        'edges': array('i', range(len(src))),
+    }
+    n_hyperedges = len(third) - third.count(-1)
+    if n_hyperedges:
+        logger.info(f'Added {len(names)} nodes and {len(src)} edges ({n_hyperedges} with three reviewers) to graph.')
+    else:
+        logger.info(f'Added {len(names)} nodes and {len(src)} edges to graph.')
+    return graph
+
+# A view of graph with only the given reviewer and edge ids. It costs just the
+# two id lists, and does not inherit the cached CSR or networkx copies.
+def make_graph_view(graph, nodes, edges):
+    view = {key: graph[key] for key in GRAPH_ARRAYS}
+    view['nodes'] = nodes
+    view['edges'] = edges
+    return view
+
+# The bisection engines all work on pairs of reviewers, so a graph (view) with
+# hyperedges is given to them as pairs: each three-reviewer edge becomes the
+# three pairs among its reviewers, with its weight, and each two-reviewer edge
+# gets twice its weight. A split of three reviewers cuts either none or two of
+# their pairs, so every split cuts pairs of exactly twice the weight of the
+# papers it cuts. KL's gains on the pairs are then exactly the FM gains on the
+# hyperedges (moving a reviewer off a hyperedge it alone holds on its side
+# uncuts it, moving one off an uncut hyperedge cuts it, anything else is 0).
+# Pairs from several edges are merged. Returns src, dst, weight and the ids of
+# the pairs, which are just the graph's own arrays and edges if it has no
+# hyperedges.
+def get_pair_graph(graph):
+    src, dst, third, weight = graph['src'], graph['dst'], graph['third'], graph['weight']
+    edges = graph['edges']
+    if all(third[e] < 0 for e in edges):
+        return src, dst, weight, edges
+    pair_weights = {}
+    for e in edges:
+        u, v, t, w = src[e], dst[e], third[e], weight[e]
+        if t < 0:
+            key = (u, v) if u < v else (v, u)
+            pair_weights[key] = pair_weights.get(key, 0) + 2 * w
+        else: # u < v < t
+            for key in ((u, v), (u, t), (v, t)):
+                pair_weights[key] = pair_weights.get(key, 0) + w
+    pair_src = array('i', (u for u, v in pair_weights))
+    pair_dst = array('i', (v for u, v in pair_weights))
+    return pair_src, pair_dst, array('i', pair_weights.values()), range(len(pair_src))
+
+# networkx copy of a graph (view) with reviewer ids as nodes, which only the
+# networkx engine needs (so networkx is only imported here).
+def make_nx_graph(graph):
+    import networkx as nx
+    src, dst, weight, edges = get_pair_graph(graph)
+    nx_graph = nx.Graph()
+    nx_graph.add_nodes_from(graph['nodes'])
+    nx_graph.add_weighted_edges_from((src[e], dst[e], weight[e]) for e in edges)
+    return nx_graph
+
+def get_nx_graph(graph):
+    if 'nx' not in graph:
+        graph['nx'] = make_nx_graph(graph)
+    return graph['nx']
+
+# rng is a random.Random, so that a trial is reproducible from its seed.
+# initial is an optional starting split (two sets of reviewer ids); without it,
+# every engine starts from a random balanced split. Engines return the split
+# as two sets of reviewer ids.
+def partition_kl_bisection(graph, rng=None, initial=None):
+    from networkx.algorithms import community
+    split = community.kernighan_lin_bisection(get_nx_graph(graph), partition=initial, max_iter=100,
+                                              weight='weight', seed=rng)
+    return split
+
+# Compact CSR (compressed sparse row) copy of a graph (view): its reviewers are
+# numbered 0..n-1 in graph order (nodes maps them back to reviewer ids), and the
+# neighbors of reviewer i are adj[offsets[i]:offsets[i+1]] with edge weights in
+# the same slots of adj_weights.
+def make_csr_graph(graph):
+    nodes = list(graph['nodes'])
+    index = {r: i for i, r in enumerate(nodes)}
+    src, dst, weight, edges = get_pair_graph(graph)
+    offsets = [0] * (len(nodes) + 1)
+    for e in edges:
+        offsets[index[src[e]] + 1] += 1
+        offsets[index[dst[e]] + 1] += 1
+    for i in range(len(nodes)):
+        offsets[i+1] += offsets[i]
+    fill = offsets[:-1]
+    adj = [0] * offsets[-1]
+    adj_weights = [0] * offsets[-1]
+    for e in edges:
+        u, v, w = index[src[e]], index[dst[e]], weight[e]
+        adj[fill[u]] = v
+        adj_weights[fill[u]] = w
+        fill[u] += 1
+        adj[fill[v]] = u
+        adj_weights[fill[v]] = w
+        fill[v] += 1
+    return nodes, offsets, adj, adj_weights
+
+# The full graph is bisected on every trial, so keep its CSR copy with it.
+def get_csr_graph(graph):
+    if 'csr' not in graph:
+        graph['csr'] = make_csr_graph(graph)
+    return graph['csr']
+
+def random_balanced_sides(n, rng=None):
+    order = list(range(n))
+    (rng or random).shuffle(order)
+    side = [0] * n
+    for i in order[n // 2:]:
+        side[i] = 1
+    return side
+
+def get_csr_gains(csr, side):
+    nodes, offsets, adj, adj_weights = csr
+    gains = []
+    for v in range(len(nodes)):
+        gain = 0
+        for k in range(offsets[v], offsets[v+1]):
+            if side[adj[k]] == side[v]:
+                gain -= adj_weights[k]
+            else:
+                gain += adj_weights[k]
+        gains.append(gain)
+    return gains
+
+# Gain buckets for one KL pass: buckets[s][gain + max_gain] holds the unlocked
+# reviewers on side s with that gain (a dict, used as an insertion-ordered set),
+# and top[s] is the highest bucket on side s that might be non-empty. Reviewers
+# marked in fixed (if given) are pinned to their side, so never enter a bucket.
+def make_gain_buckets(csr, side, fixed=None):
+    nodes, offsets, adj, adj_weights = csr
+    n = len(nodes)
+    gains = get_csr_gains(csr, side)
+    # a gain is at most the reviewer's weighted degree, which bounds the buckets
+    max_gain = max([sum(adj_weights[offsets[v]:offsets[v+1]]) for v in range(n)] + [0])
+    buckets = [[{} for i in range(2 * max_gain + 1)] for s in range(2)]
+    top = [0, 0]
+    for v in range(n):
+        if fixed and fixed[v]:
+            continue
+        b = gains[v] + max_gain
+        buckets[side[v]][b][v] = True
+        top[side[v]] = max(top[side[v]], b)
+    return gains, max_gain, buckets, top
+
+# Moves the best unlocked reviewer off side s, locks it, updates the gains of
+# its unlocked neighbors in O(degree), and returns it.
+def move_best_from_side(csr, s, side, locked, gain_buckets):
+    nodes, offsets, adj, adj_weights = csr
+    gains, max_gain, buckets, top = gain_buckets
+    side_buckets = buckets[s]
+    while not side_buckets[top[s]]:
+        top[s] -= 1
+    v = next(iter(side_buckets[top[s]]))
+    del side_buckets[top[s]][v]
+    locked[v] = True
+    side[v] = 1 - s
+    for k in range(offsets[v], offsets[v+1]):
+        u = adj[k]
+        if locked[u]:
+            continue
+        su = side[u]
+        b = gains[u] + max_gain
+        del buckets[su][b][u]
+        if su == s: # u was on v's old side, so moving u now gains more
+            gains[u] += 2 * adj_weights[k]
+        else:
+            gains[u] -= 2 * adj_weights[k]
+        b = gains[u] + max_gain
+        buckets[su][b][u] = True
+        if b > top[su]:
+            top[su] = b
+    return v
+
+# One Kernighan-Lin pass in the single-move (Fiduccia-Mattheyses) form used by
+# networkx: alternately move the best unlocked reviewer off each side, then keep
+# the prefix of moves with the largest total gain. With gains kept in buckets,
+# the whole pass is near-linear in the number of edges. Edits side in place
+# and returns the reduction in cut cost. Reviewers marked in fixed never move.
+def csr_kl_pass(csr, side, fixed=None):
+    n = len(csr[0])
+    gain_buckets = make_gain_buckets(csr, side, fixed)
+    gains = gain_buckets[0]
+    locked = list(fixed) if fixed else [False] * n
+    unlocked = [0, 0]
+    for v in range(n):
+        if not locked[v]:
+            unlocked[side[v]] += 1
+    moves = []
+    total = best_total = 0
+    best_len = 0
+    while unlocked[0] and unlocked[1]:
+        for s in (0, 1):
+            v = move_best_from_side(csr, s, side, locked, gain_buckets)
+            unlocked[s] -= 1
+            total += gains[v]
+            moves.append(v)
+        if total > best_total:
+            best_total = total
+            best_len = len(moves)
+    for v in moves[best_len:]: # undo moves after the best prefix
+        side[v] = 1 - side[v]
+    return best_total
+
+# Like csr_kl_pass, but for reviewers with weights (e.g. merged reviewers in a
+# coarsened graph). Each move comes off the heavier side, and the pass keeps
+# the best prefix whose side weights differ by at most max_imbalance, or else
+# the prefix that comes closest to that. With anchor (a side per reviewer),
+# every reviewer off its anchor side costs move_penalty in that choice. With
+# max_stall, the pass ends after that many moves without a new best prefix.
+def csr_weighted_kl_pass(csr, side, node_weights, max_imbalance, fixed=None, anchor=None, move_penalty=0,
+                         max_stall=None):
+    n = len(csr[0])
+    gain_buckets = make_gain_buckets(csr, side, fixed)
+    gains = gain_buckets[0]
+    locked = list(fixed) if fixed else [False] * n
+    unlocked = [0, 0]
+    side_weights = [0, 0]
+    for v in range(n):
+        side_weights[side[v]] += node_weights[v]
+        if not locked[v]:
+            unlocked[side[v]] += 1
+    moves = []
+    total = 0
+    moved = sum(side[v] != anchor[v] for v in range(n)) if anchor else 0
+    def state_key():
+        imbalance = abs(side_weights[0] - side_weights[1])
+        if imbalance <= max_imbalance:
+            return (1, total - move_penalty * moved)
+        return (0, -imbalance)
+    start_key = best_key = state_key()
+    best_len = 0
+    while True:
+        s = 0 if side_weights[0] >= side_weights[1] else 1
+        if not unlocked[s]:
+            break
+        v = move_best_from_side(csr, s, side, locked, gain_buckets)
+        unlocked[s] -= 1
+        side_weights[s] -= node_weights[v]
+        side_weights[1 - s] += node_weights[v]
+        total += gains[v]
+        moves.append(v)
+        if anchor:
+            moved += 1 if side[v] != anchor[v] else -1
+        key = state_key()
+        if key > best_key:
+            best_key = key
+            best_len = len(moves)
+        elif max_stall and len(moves) - best_len >= max_stall:
+            break
+    for v in moves[best_len:]: # undo moves after the best prefix
+        side[v] = 1 - side[v]
+    return best_key > start_key
+
+def refine_csr_bisection(csr, side, max_iter=100, node_weights=None, max_imbalance=1, fixed=None, anchor=None,
+                         move_penalty=0, max_stall=None):
+    for i in range(max_iter):
+        if node_weights:
+            improved = csr_weighted_kl_pass(csr, side, node_weights, max_imbalance, fixed, anchor, move_penalty,
+                                            max_stall)
+        else:
+            improved = csr_kl_pass(csr, side, fixed) > 0
+        if not improved:
+            break
+    return side
+
+def split_to_csr_sides(csr, split):
+    nodes = csr[0]
+    in_split0 = set(split[0])
+    return [0 if r in in_split0 else 1 for r in nodes]
+
+def csr_sides_to_split(csr, side):
+    nodes = csr[0]
+    split = (set(), set())
+    for v, r in enumerate(nodes):
+        split[side[v]].add(r)
+    return split
+
+# Same contract as partition_kl_bisection, but runs on the CSR copy of the graph.
+def partition_csr_bisection(graph, rng=None, initial=None):
+    csr = get_csr_graph(graph)
+    if initial:
+        side = split_to_csr_sides(csr, initial)
+    else:
+        side = random_balanced_sides(len(csr[0]), rng)
+    refine_csr_bisection(csr, side)
+    return csr_sides_to_split(csr, side)
+
+def get_csr_cut_cost(csr, side):
+    nodes, offsets, adj, adj_weights = csr
+    cost = 0
+    for v in range(len(nodes)):
+        for k in range(offsets[v], offsets[v+1]):
+            if side[adj[k]] != side[v]:
+                cost += adj_weights[k]
+    return cost // 2 # every cut edge was counted from both ends
+
+# Multilevel (METIS-style) bisection: repeatedly coarsen the graph by merging
+# reviewers joined by heavy edges, bisect the small coarsest graph, then project
+# the split back up level by level, refining it with KL at each level.
+COARSEST_SIZE = 40 # stop coarsening at about this many (merged) reviewers
+COARSEST_TRIES = 8 # random starts for the bisection of the coarsest graph
+# A split projected from the level below is already nearly refined, so each
+# level gets a few KL passes, and a pass stops once this many moves in a row
+# have not beaten its best prefix (as in FM) rather than moving every reviewer.
+REFINE_PASSES = 8
+REFINE_STALL = 200
+
+# Heavy-edge matching: visit reviewers in random order and merge each unmatched
+# one with its unmatched neighbor of largest edge weight. Returns the coarse
+# CSR graph, its node weights and the map from fine to coarse reviewers.
+def coarsen_csr_graph(csr, node_weights, rng):
+    nodes, offsets, adj, adj_weights = csr
+    n = len(nodes)
+    order = list(range(n))
+    rng.shuffle(order)
+    match = [-1] * n
+    for v in order:
+        if match[v] >= 0:
+            continue
+        best_u, best_w = v, 0
+        for k in range(offsets[v], offsets[v+1]):
+            u = adj[k]
+            if match[u] < 0 and u != v and adj_weights[k] > best_w:
+                best_u, best_w = u, adj_weights[k]
+        match[v] = best_u
+        match[best_u] = v
+    coarse_of = [-1] * n
+    n_coarse = 0
+    for v in range(n):
+        if coarse_of[v] < 0:
+            coarse_of[v] = coarse_of[match[v]] = n_coarse
+            n_coarse += 1
+    coarse_weights = [0] * n_coarse
+    rows = [{} for i in range(n_coarse)]
+    for v in range(n):
+        cv = coarse_of[v]
+        coarse_weights[cv] += node_weights[v]
+        row = rows[cv]
+        for k in range(offsets[v], offsets[v+1]):
+            cu = coarse_of[adj[k]]
+            if cu != cv: # edges inside a merged pair disappear
+                row[cu] = row.get(cu, 0) + adj_weights[k]
+    coarse_offsets = [0]
+    coarse_adj = []
+    coarse_adj_weights = []
+    for row in rows:
+        coarse_adj += row.keys()
+        coarse_adj_weights += row.values()
+        coarse_offsets.append(len(coarse_adj))
+    coarse_csr = (list(range(n_coarse)), coarse_offsets, coarse_adj, coarse_adj_weights)
+    return coarse_csr, coarse_weights, coarse_of
+
+# Greedy random start for a weighted bisection: add reviewers in random order to
+# whichever side is lighter.
+def random_weighted_sides(node_weights, rng):
+    n = len(node_weights)
+    order = list(range(n))
+    rng.shuffle(order)
+    side = [0] * n
+    side_weights = [0, 0]
+    for v in order:
+        s = 0 if side_weights[0] <= side_weights[1] else 1
+        side[v] = s
+        side_weights[s] += node_weights[v]
+    return side
+
+def bisect_coarsest_csr(csr, node_weights, rng):
+    max_imbalance = max(node_weights + [1])
+    best_side, best_cost = None, None
+    for i in range(COARSEST_TRIES):
+        side = random_weighted_sides(node_weights, rng)
+        refine_csr_bisection(csr, side, node_weights=node_weights, max_imbalance=max_imbalance)
+        cost = get_csr_cut_cost(csr, side)
+        if best_side is None or cost < best_cost:
+            best_side, best_cost = side, cost
+    return best_side
+
+def multilevel_bisect_csr(csr, rng):
+    node_weights = [1] * len(csr[0])
+    levels = []
+    while len(csr[0]) > COARSEST_SIZE:
+        coarse_csr, coarse_weights, coarse_of = coarsen_csr_graph(csr, node_weights, rng)
+        if len(coarse_csr[0]) > 0.9 * len(csr[0]): # matching has stalled
+            break
+        levels.append((csr, node_weights, coarse_of))
+        csr, node_weights = coarse_csr, coarse_weights
+    side = bisect_coarsest_csr(csr, node_weights, rng)
+    for csr, node_weights, coarse_of in reversed(levels):
+        side = [side[coarse_of[v]] for v in range(len(csr[0]))]
+        max_imbalance = max(node_weights + [1])
+        refine_csr_bisection(csr, side, REFINE_PASSES, node_weights=node_weights, max_imbalance=max_imbalance,
+                             max_stall=REFINE_STALL)
+    return side
+
+# Same contract as partition_kl_bisection, using the multilevel scheme above.
+# A starting split is already a good one, so it is only refined at full size.
+def partition_multilevel_bisection(graph, rng=None, initial=None):
+    if initial:
+        return partition_csr_bisection(graph, rng, initial)
+    csr = get_csr_graph(graph)
+    side = multilevel_bisect_csr(csr, rng or random)
+    return csr_sides_to_split(csr, side)
+
+PARTITION_ENGINES = {
+    'csr': partition_csr_bisection,
+    'multilevel': partition_multilevel_bisection,
+    'networkx': partition_kl_bisection,
+}
+
+def partition_graph(graph, rng=None, engine='csr', initial=None, load_balance=0.0):
+    if load_balance and engine == 'csr': # the csr engine is just KL, so go straight to the weighted KL
+        csr = get_csr_graph(graph)
+        split = initial or csr_sides_to_split(csr, random_balanced_sides(len(csr[0]), rng))
+    else:
+        split = PARTITION_ENGINES[engine](graph, rng, initial)
+    if load_balance:
+        split = balance_split_loads(graph, split, load_balance)
+    return split_to_partition(graph, split)
+
+# Paper load of each reviewer of a graph (view), in CSR order: how many papers
+# it reviews with only reviewers of the view. Those are the papers a room of
+# this round could hold, including papers of earlier rooms (not just the edges
+# of the view), so they are counted over all the edges of the full graph.
+def get_csr_loads(graph):
+    if 'loads' not in graph:
+        nodes = get_csr_graph(graph)[0]
+        index = {r: i for i, r in enumerate(nodes)}
+        src, dst, third, weight = graph['src'], graph['dst'], graph['third'], graph['weight']
+        loads = [0] * len(nodes)
+        for e in range(len(src)):
+            u, v = index.get(src[e]), index.get(dst[e])
+            t = -1 if third[e] < 0 else index.get(third[e]) # None if the third is outside the view
+            if u is None or v is None or t is None:
+                continue
+            loads[u] += weight[e]
+            loads[v] += weight[e]
+            if t >= 0:
+                loads[t] += weight[e]
+        graph['loads'] = loads
+    return graph['loads']
+
+# Paper loads of all the reviewers of the full graph, by name.
+def get_reviewer_loads(graph):
+    if 'reviewer_loads' not in graph:
+        names = graph['reviewers']
+        graph['reviewer_loads'] = {names[r]: load for r, load in zip(get_csr_graph(graph)[0], get_csr_loads(graph))}
+    return graph['reviewer_loads']
+
+# The engines balance reviewer counts, but the rooms must hold equal numbers of
+# papers, and a split with many more papers on one side than the other is thrown
+# away when its papers will not fit under the room caps. So this refines a split
+# with weighted KL (on the CSR copy, whatever the engine) until the paper loads
+# of its sides differ by at most tolerance times their total. A paper inside a
+# side counts on it once per reviewer and a cut paper counts on both, so (for
+# two-reviewer papers) the sides' loads differ by exactly twice the difference
+# in papers that stay in their rooms.
+def balance_split_loads(graph, split, tolerance):
+    csr = get_csr_graph(graph)
+    loads = get_csr_loads(graph)
+    side = split_to_csr_sides(csr, split)
+    max_imbalance = max(1, int(tolerance * sum(loads)))
+    refine_csr_bisection(csr, side, node_weights=loads, max_imbalance=max_imbalance)
+    return csr_sides_to_split(csr, side)
+
+# (room0, room1, cut edges) of a split, with reviewer names in the rooms.
+def split_to_partition(graph, split):
+    names = graph['reviewers']
+    # keep graph node order (not set order) so results do not depend on hashing
+    room0 = [names[r] for r in graph['nodes'] if r in split[0]]
+    room1 = [names[r] for r in graph['nodes'] if r in split[1]]
+    src, dst, third = graph['src'], graph['dst'], graph['third']
+    in0 = split[0]
+    cut_edges = [e for e in graph['edges']
+                 if (src[e] in in0) != (dst[e] in in0) or (third[e] >= 0 and (third[e] in in0) != (src[e] in in0))]
+    return room0, room1, cut_edges
+
+# Re-optimizes a split of graph with some reviewers pinned: pins maps reviewer
+# ids to the side (0 or 1) they must be on. The pinned reviewers are moved to
+# their sides, and KL (on the CSR copy, whatever the engine) then refines the
+# split from there, moving only unpinned reviewers and off the bigger side, so
+# the sides are evened out again. Each reviewer off its side in anchor (a split,
+# by default initial) costs MOVE_PENALTY papers: without it, KL answers a pin by
+# moving everyone else to the other side instead, which has the old cut but
+# swaps the room labels. Returns a partition, as partition_graph does.
+MOVE_PENALTY = 0.5
+
+def repartition_graph(graph, initial, pins, anchor=None):
+    csr = get_csr_graph(graph)
+    side = split_to_csr_sides(csr, initial)
+    anchor_side = split_to_csr_sides(csr, anchor or initial)
+    fixed = [False] * len(side)
+    for v, r in enumerate(csr[0]):
+        if r in pins:
+            side[v] = pins[r]
+            fixed[v] = True
+    refine_csr_bisection(csr, side, node_weights=[1] * len(side), fixed=fixed, anchor=anchor_side,
+                         move_penalty=MOVE_PENALTY)
+    return split_to_partition(graph, csr_sides_to_split(csr, side))
+
+# Starting split for iterated local search: reviewers keep their rooms from a
+# previous partition (those not in it are dealt to the smaller room), the rooms
+# are evened out, and then a fraction of reviewers trade places in random pairs.
+def perturb_split(graph, partition, fraction, rng):
+    index = graph['index']
+    in_room0 = {index[r] for r in partition[0]}
+    in_room1 = {index[r] for r in partition[1]}
+    room0 = [r for r in graph['nodes'] if r in in_room0]
+    room1 = [r for r in graph['nodes'] if r in in_room1]
+    new = [r for r in graph['nodes'] if r not in in_room0 and r not in in_room1]
+    rng.shuffle(new)
+    for r in new:
+        (room0 if len(room0) <= len(room1) else room1).append(r)
+    while abs(len(room0) - len(room1)) > 1:
+        bigger, smaller = (room0, room1) if len(room0) > len(room1) else (room1, room0)
+        smaller.append(bigger.pop(rng.randrange(len(bigger))))
+    swaps = min(max(1, int(fraction * len(room0))), len(room0), len(room1))
+    for i, j in zip(rng.sample(range(len(room0)), swaps), rng.sample(range(len(room1)), swaps)):
+        room0[i], room1[j] = room1[j], room0[i]
+    return set(room0), set(room1)
+
+# Spectral seeding: an approximate Fiedler vector (the eigenvector for the
+# second smallest eigenvalue of the weighted Laplacian L = D - W) orders the
+# reviewers so that those on the same side of its median are mostly joined to
+# each other, which makes a much better start for KL than a random split. It
+# is found by power iteration on c*I - L, whose top eigenvector (the constant
+# one) is projected out at every step, so it converges to the Fiedler vector.
+# NumPy is used for the iterations if it is installed (it is much faster on
+# the subgraph, which is seeded anew on every trial), and plain Python if not.
+FIEDLER_ITERATIONS = 300
+FIEDLER_TOLERANCE = 1e-6
+
+def get_csr_fiedler_vector(csr, iterations=FIEDLER_ITERATIONS, tolerance=FIEDLER_TOLERANCE):
+    nodes, offsets, adj, adj_weights = csr
+    n = len(nodes)
+    if n < 2:
+        return [0.0] * n
+    degrees = [sum(adj_weights[offsets[v]:offsets[v+1]]) for v in range(n)]
+    c = 2 * max(degrees + [1]) # at least the largest eigenvalue of L
+    rng = random.Random(n) # so the vector depends only on the graph
+    x = [rng.random() - 0.5 for v in range(n)]
+    try:
+        import numpy
+    except ImportError:
+        return power_iterate_fiedler(csr, degrees, c, x, iterations, tolerance)
+    return numpy_power_iterate_fiedler(numpy, csr, degrees, c, x, iterations, tolerance)
+
+def power_iterate_fiedler(csr, degrees, c, x, iterations, tolerance):
+    nodes, offsets, adj, adj_weights = csr
+    n = len(nodes)
+    for i in range(iterations):
+        mean = sum(x) / n
+        x = [xv - mean for xv in x]
+        norm = math.sqrt(sum(xv * xv for xv in x)) or 1.0
+        x = [xv / norm for xv in x]
+        y = []
+        for v in range(n):
+            total = (c - degrees[v]) * x[v]
+            for k in range(offsets[v], offsets[v+1]):
+                total += adj_weights[k] * x[adj[k]]
+            y.append(total / c)
+        # y = (c*I - L) x / c; stop once the direction no longer changes
+        mean = sum(y) / n
+        y = [yv - mean for yv in y]
+        norm = math.sqrt(sum(yv * yv for yv in y)) or 1.0
+        y = [yv / norm for yv in y]
+        change = sum((yv - xv) ** 2 for xv, yv in zip(x, y))
+        x = y
+        if change < tolerance:
+            break
+    return x
+
+# Same as power_iterate_fiedler, with the products done by NumPy.
+def numpy_power_iterate_fiedler(numpy, csr, degrees, c, x, iterations, tolerance):
+    nodes, offsets, adj, adj_weights = csr
+    n = len(nodes)
+    rows = numpy.repeat(numpy.arange(n), numpy.diff(offsets))
+    adj = numpy.asarray(adj)
+    adj_weights = numpy.asarray(adj_weights, dtype=float)
+    diagonal = c - numpy.asarray(degrees, dtype=float)
+    x = numpy.asarray(x)
+    x = x - x.mean()
+    x /= numpy.linalg.norm(x) or 1.0
+    for i in range(iterations):
+        y = (diagonal * x + numpy.bincount(rows, adj_weights * x[adj], minlength=n)) / c
+        y -= y.mean()
+        y /= numpy.linalg.norm(y) or 1.0
+        change = float(numpy.sum((y - x) ** 2))
+        x = y
+        if change < tolerance:
+            break
+    return x.tolist()
+
+# The full graph is seeded on every trial, so keep its Fiedler vector with it.
+def get_fiedler_vector(graph):
+    if 'fiedler' not in graph:
+        graph['fiedler'] = get_csr_fiedler_vector(get_csr_graph(graph))
+    return graph['fiedler']
+
+# Starting split for spectral seeding: the reviewers below and above the median
+# of the Fiedler vector, after adding Gaussian noise of noise times its spread
+# (the vector has unit norm), so that each trial starts from a different split.
+def spectral_split(graph, noise, rng):
+    nodes = get_csr_graph(graph)[0]
+    fiedler = get_fiedler_vector(graph)
+    n = len(nodes)
+    scale = noise / math.sqrt(max(n, 1))
+    keys = [xv + rng.gauss(0, scale) for xv in fiedler]
+    order = sorted(range(n), key=keys.__getitem__)
+    return {nodes[v] for v in order[:n // 2]}, {nodes[v] for v in order[n // 2:]}
+
+# Each paper is on exactly one edge, so this has no repeats.
+def get_papers_in_graph_cut(graph, cut):
+    pids, pid_offsets, pid_index = graph['pids'], graph['pid_offsets'], graph['pid_index']
+    return [pids[pid_index[k]] for e in cut for k in range(pid_offsets[e], pid_offsets[e+1])]
+
+def get_reviewers_in_graph_cut(graph, cut):
+    src, dst, third = graph['src'], graph['dst'], graph['third']
+    in_cut = {}
+    for e in cut:
+        in_cut[src[e]] = True
+        in_cut[dst[e]] = True
+        if third[e] >= 0:
+            in_cut[third[e]] = True
+    return list(in_cut) # unique reviewer ids, in order of first appearance
+
+# The subgraph for the second bisection is a view over the cut edges.
+def make_subgraph_from_cut(graph, partition):
+    roomA, roomB, cutC = partition
+    return make_graph_view(graph, get_reviewers_in_graph_cut(graph, cutC), cutC)
+
+def dump_string_to_file(fname, lines):
+    with open(fname, 'w') as f:
+        f.write(lines)
+
+def dump_people_rooms(fname, room0, room1):
+    lines = 'Reviewer,Room\n'
+    for person in room0:
+        lines += f'{person},Room0\n'
+    for person in room1:
+        lines += f'{person},Room1\n'
+    dump_string_to_file(fname, lines)
+
+# Room index for one round: maps each reviewer to room code 0 or 1 (A/B or X/Y).
+def make_room_index(partition):
+    room0, room1, cut = partition
+    room_index = dict.fromkeys(room0, 0)
+    room_index.update(dict.fromkeys(room1, 1))
+    return room_index
+
+def get_room(person, room_index):
+    return room_index[person]
+
+def get_list_lengths(pid_lists):
+    list_lengths = [len(pid_lists[i]) for i in range(9)]
+    return list_lengths    
+
+def dump_list_lengths(pid_lists):
+    list_lengths = get_list_lengths(pid_lists)
+    for i in range(9):
+        print(CATEGORY_LABELS[i],':',list_lengths[i])
+
+# Room code of each paper for one round: 0 or 1 if all its reviewers are in
+# that room, else 2 (the cut). Reviewers missing from the partition count as cut.
+def get_paper_room_codes(papers, partition):
+    room_index = make_room_index(partition)
+    codes = []
+    for revs in papers.values():
+        code = room_index.get(revs[0], 2)
+        for rev in revs[1:]:
+            if code != room_index.get(rev, 2):
+                code = 2
+        codes.append(code)
+    return codes
+
+def classify_papers_ABC(papers, partition):
+    codes = get_paper_room_codes(papers, partition)
+    pidsABC = [ [] for i in range(3) ]
+    for pid, code in zip(papers, codes):
+        pidsABC[code].append(pid)
+    return pidsABC
+
+# CATEGORY_BY_CODES[abc][xyz] is the category of a paper with room code abc in
+# the first round (A,B,C = 0,1,2) and xyz in the second (X,Y,Z = 0,1,2).
+CATEGORY_BY_CODES = [ [None] * 3 for i in range(3) ]
+for index, room0, room1 in LIST_ABCXYZ:
+    CATEGORY_BY_CODES[room0][room1 - 3] = index
+
+def get_paper_categories(papers, partition1, partition2):
+    codesABC = get_paper_room_codes(papers, partition1)
+    codesXYZ = get_paper_room_codes(papers, partition2)
+    return [CATEGORY_BY_CODES[abc][xyz] for abc, xyz in zip(codesABC, codesXYZ)]
+
+def classify_papers_ABCXYZ(papers, partition1, partition2):
+    categories = get_paper_categories(papers, partition1, partition2)
+    pid_lists = [ [] for i in range(9) ]
+    for pid, category in zip(papers, categories):
+        pid_lists[category].append(pid)
+    return pid_lists
+
+# With loads (reviewer paper loads, from get_reviewer_loads), the missing
+# reviewers go heaviest first to whichever room has the lighter load instead,
+# so that X and Y can take equal numbers of papers.
+def assign_people_missing_from_XY(reviewers, partion2, rng=random, loads=None):
+    roomX, roomY, cutZ = partion2
+    in_XY = set(roomX) | set(roomY)
+    missing = [r for r in reviewers if r not in in_XY]
+    # print('missing:', missing)
+    # print('roomX, roomY sizes:', len(roomX), len(roomY))
+    rng.shuffle(missing)
+    if loads:
+        missing.sort(key=lambda r: -loads.get(r, 0))
+        room_loads = [sum(loads.get(r, 0) for r in room) for room in (roomX, roomY)]
+        for rev in missing:
+            lighter = 0 if room_loads[0] <= room_loads[1] else 1
+            (roomX, roomY)[lighter].append(rev)
+            room_loads[lighter] += loads.get(rev, 0)
+        return
+    for rev in missing:
+        if len(roomX) <= len(roomY):
+            roomX.append(rev)
+        else:
+            roomY.append(rev)
+    # print('roomX, roomY sizes:', len(roomX), len(roomY))
+
+def get_neg_and_pos(i):
+    neg,pos = LIST_OPTIONS[i]
+    return neg,pos
+
+def get_max_sat_per_room(pid_lists):
+    list_lengths = get_list_lengths(pid_lists)
+    count_assignable = sum(list_lengths[:8])
+    quarter = int(math.ceil(count_assignable/4.0))
+    countCX, countCY, countAZ, countBZ = list_lengths[4:8]
+    maxA = quarter - countAZ
+    maxB = quarter - countBZ
+    maxX = quarter - countCX
+    maxY = quarter - countCY
+    return [maxA, maxB, maxX, maxY]
+
+# pysat is only imported when the SAT balancer is used.
+def sat_solve(sat_lists, max_list):
+    from pysat.formula import WCNFPlus
+    from pysat.examples.rc2 import RC2
+    cnf = WCNFPlus()
+    for i in range(4):
+        cnf.append([sat_lists[i], max_list[i]], is_atmost=True) 
+    solver = 'minicard'
+    model = None
+    with RC2(cnf, solver=solver) as rc2:
+        model = rc2.compute()
+    return model
+
+def assign_fixed_pids_to_rooms(pid_lists):
+    paper_rooms = [ [], [], [], [] ] # four empty lists
+    # assign pids that only have one option to that room
+    for i in range(4,8):
+        assign_to = ONLY_OPTIONS[i]
+        for pid in pid_lists[i]:
+            paper_rooms[assign_to].append(pid)
+    return paper_rooms
+
+def sat_assign_pids_to_rooms(pid_lists):
+    sat_count = 1
+    sat_lists = [ [] for i in range(4) ]
+    sat_to_pid = {}
+    for i in range(4):
+        pid_list = pid_lists[i]
+        # list_label = CATEGORY_LABELS[i]
+        # list_len = len(pid_list)
+        neg,pos = get_neg_and_pos(i)
+        # print(f'assign sat vars to {list_len} papers in {list_label} with neg {neg} and pos {pos} ...')
+        for pid in pid_list:
+            tup = (pid, neg, pos)
+            sat_to_pid[sat_count] = tup
+            sat_lists[neg].append(-sat_count)
+            sat_lists[pos].append( sat_count)
+            sat_count += 1
+    max_list = get_max_sat_per_room(pid_lists) # max in rooms A, B, X, Y
+
+    model = sat_solve(sat_lists, max_list)
+    if not model:
+        return None
+
+    paper_rooms = assign_fixed_pids_to_rooms(pid_lists)
+
+    # next go through model solution assigning to each room
+    for var in model:
+        sat_var = abs(var)
+        pid, neg, pos = sat_to_pid[sat_var] 
+        if var > 0:
+            paper_rooms[pos].append(pid)
+        else:
+            paper_rooms[neg].append(pid)
+
+    return paper_rooms
+
+# The flexible categories 0-3 (AX,BX,AY,BY) and the rooms A,B,X,Y form a small
+# transportation problem: each category can send its papers to its two rooms
+# (LIST_OPTIONS), and each room can take papers up to a capacity. So rather
+# than SAT, we can balance rooms directly:
+#
+# * By Hall's theorem, every room can be held to at most L papers iff for each
+#   set S of flexible categories, the papers in S fit in the rooms S can use:
+#   COUNT(S) <= SUM over those rooms of (L - papers fixed in that room).
+#   With only 15 sets S, the smallest such L has a closed form.
+# * Given L, a max flow on the 10-node network source -> categories -> rooms ->
+#   sink says how many papers of each category go to each room.
+#
+# L equals the SAT quarter cap whenever the SAT problem is feasible, and when
+# it is not, L is the tightest balance that can be achieved.
+
+def get_fixed_room_counts(pid_lists):
+    list_lengths = get_list_lengths(pid_lists)
+    fixed = [0, 0, 0, 0]
+    for i in range(4,8):
+        fixed[ONLY_OPTIONS[i]] += list_lengths[i]
+    return fixed
+
+def get_min_max_room_size(pid_lists):
+    list_lengths = get_list_lengths(pid_lists)
+    fixed = get_fixed_room_counts(pid_lists)
+    quarter = int(math.ceil(sum(list_lengths[:8])/4.0))
+    max_size = max([quarter] + fixed)
+    for subset in range(1, 16): # bitmask over the four flexible categories
+        count = 0
+        rooms = set()
+        for i in range(4):
+            if subset & (1 << i):
+                count += list_lengths[i]
+                rooms.update(LIST_OPTIONS[i])
+        fixed_in_rooms = sum(fixed[r] for r in rooms)
+        needed = int(math.ceil((count + fixed_in_rooms) / len(rooms)))
+        max_size = max(max_size, needed)
+    return max_size
+
+# Edmonds-Karp max flow on a dense capacity matrix; returns the flow matrix.
+def max_flow(capacity, source, sink):
+    n = len(capacity)
+    flow = [ [0] * n for i in range(n) ]
+    return augment_flow(capacity, flow, source, sink)
+
+# Augments flow (in place) until it is a max flow for capacity, and returns it.
+# Since any feasible flow can be the start, a flow stays useful after some
+# capacities are raised.
+def augment_flow(capacity, flow, source, sink):
+    n = len(capacity)
+    while True:
+        parent = [-1] * n
+        parent[source] = source
+        queue = [source]
+        for u in queue:
+            for v in range(n):
+                if parent[v] < 0 and capacity[u][v] - flow[u][v] > 0:
+                    parent[v] = u
+                    queue.append(v)
+        if parent[sink] < 0:
+            return flow
+        path_flow = None
+        v = sink
+        while v != source:
+            u = parent[v]
+            residual = capacity[u][v] - flow[u][v]
+            path_flow = residual if path_flow is None else min(path_flow, residual)
+            v = u
+        v = sink
+        while v != source:
+            u = parent[v]
+            flow[u][v] += path_flow
+            flow[v][u] -= path_flow
+            v = u
+
+# Returns how many papers of each flexible category go to its neg and pos rooms
+# when no room may hold more than max_size papers.
+def get_flexible_room_counts(pid_lists, max_size):
+    list_lengths = get_list_lengths(pid_lists)
+    fixed = get_fixed_room_counts(pid_lists)
+    source, sink = 0, 9 # nodes 1-4 are categories 0-3, nodes 5-8 are rooms 0-3
+    capacity = [ [0] * 10 for i in range(10) ]
+    for i in range(4):
+        capacity[source][1 + i] = list_lengths[i]
+        for room in LIST_OPTIONS[i]:
+            capacity[1 + i][5 + room] = list_lengths[i]
+    for room in range(4):
+        capacity[5 + room][sink] = max_size - fixed[room]
+    flow = max_flow(capacity, source, sink)
+    counts = []
+    for i in range(4):
+        neg,pos = get_neg_and_pos(i)
+        counts.append((flow[1 + i][5 + neg], flow[1 + i][5 + pos]))
+    return counts
+
+def flow_assign_pids_to_rooms(pid_lists):
+    max_size = get_min_max_room_size(pid_lists)
+    counts = get_flexible_room_counts(pid_lists, max_size)
+    paper_rooms = assign_fixed_pids_to_rooms(pid_lists)
+    for i in range(4):
+        neg,pos = get_neg_and_pos(i)
+        count_neg = counts[i][0]
+        paper_rooms[neg] += pid_lists[i][:count_neg]
+        paper_rooms[pos] += pid_lists[i][count_neg:]
+    return paper_rooms
+
+def get_quarter_room_size(pid_lists):
+    list_lengths = get_list_lengths(pid_lists)
+    return int(math.ceil(sum(list_lengths[:8])/4.0))
+
+# How many papers the fullest room holds beyond the quarter cap used by SAT.
+def get_room_excess(pid_lists, paper_rooms):
+    return max(len(room) for room in paper_rooms) - get_quarter_room_size(pid_lists)
+
+# Runs both balancers and raises InvariantError if they disagree on whether
+# the quarter caps can be met; returns the flow result.
+def check_assign_pids_to_rooms(pid_lists):
+    paper_rooms = flow_assign_pids_to_rooms(pid_lists)
+    flow_ok = get_room_excess(pid_lists, paper_rooms) <= 0
+    sat_ok = sat_assign_pids_to_rooms(pid_lists) is not None
+    if flow_ok != sat_ok:
+        raise InvariantError(f'flow and SAT balancers disagree (flow {flow_ok}, SAT {sat_ok}) for {get_list_lengths(pid_lists)}')
+    return paper_rooms
+
+BALANCERS = {
+    'flow': flow_assign_pids_to_rooms,
+    'sat': sat_assign_pids_to_rooms,
+    'check': check_assign_pids_to_rooms,
+}
+
+def assign_pids_to_rooms(pid_lists, balancer='flow'):
+    return BALANCERS[balancer](pid_lists)
+
+# Returns (paper_rooms, excess), or (None, None) if the balancer found no
+# assignment within max_excess papers of the quarter cap. With counters, adds
+# the time spent classifying and balancing, and the SAT calls and failures.
+def assign_papers_to_rooms(reviewers, papers, partition1, partition2, rng=random, balancer='flow', max_excess=0,
+                           counters=None, loads=None):
+    if counters is None:
+        counters = new_trial_counters()
+    start = time.perf_counter()
+    assign_people_missing_from_XY(reviewers, partition2, rng, loads)
+    pid_lists = classify_papers_ABCXYZ(papers, partition1, partition2)
+    start = add_stage_time(counters, 'classify', start)
+    # the closed-form balance bound says up front if no balancer can succeed
+    if get_min_max_room_size(pid_lists) - get_quarter_room_size(pid_lists) > max_excess:
+        add_stage_time(counters, 'balance', start)
+        return None, None
+    paper_rooms = assign_pids_to_rooms(pid_lists, balancer) # pidsA, pidsB, pidsX, pidsY
+    add_stage_time(counters, 'balance', start)
+    if balancer in ('sat', 'check'):
+        counters['sat_calls'] += 1
+        # check has already halted unless SAT agrees with the flow result
+        if not paper_rooms or get_room_excess(pid_lists, paper_rooms) > 0:
+            counters['sat_failures'] += 1
+    if not paper_rooms:
+        return None, None
+    excess = max(0, get_room_excess(pid_lists, paper_rooms))
+    if excess > max_excess:
+        return None, None
+    return paper_rooms, excess
+
+# R-round engine (--rounds R): round 1 bisects the reviewer graph, and each
+# later round bisects the subgraph of the papers cut in the round before. A
+# paper can go to the room of any round in which both its reviewers are in the
+# same room, so each paper's category is the tuple of those rooms (room 2k or
+# 2k+1 in round k), and the empty tuple is plenary. With two rounds these are
+# the nine categories above (AX is (0, 2), CZ is ()). Papers are balanced over
+# the 2R rooms with max flows, as for two rounds, but the smallest feasible
+# room size L is found by raising L from the average until the flow fits.
+
+def classify_papers_rounds(papers, partitions):
+    codes = [get_paper_room_codes(papers, partition) for partition in partitions]
+    pid_groups = {}
+    for j, pid in enumerate(papers):
+        rooms = tuple(2*k + round_codes[j] for k, round_codes in enumerate(codes) if round_codes[j] != 2)
+        pid_groups.setdefault(rooms, []).append(pid)
+    return pid_groups
+
+def get_assignable_room_size(pid_groups, n_rooms):
+    assignable = sum(len(pids) for rooms, pids in pid_groups.items() if rooms)
+    return int(math.ceil(assignable / n_rooms))
+
+# Returns paper_rooms for the tightest balance: source -> categories -> rooms
+# -> sink, with room capacities L. A flow that falls d papers short at L can
+# only fit if every room grows by at least d / n_rooms, so L is raised by that
+# much and the flow is augmented further, never overshooting the smallest L.
+# With previous_rooms (pid to room number), the papers are then spread over
+# the rooms at that L by a min-cost flow instead, as repair does, so that
+# re-balancing moves as few papers out of their previous rooms as it can.
+def flow_assign_groups_to_rooms(pid_groups, n_rooms, previous_rooms=None):
+    groups = [(rooms, pids) for rooms, pids in pid_groups.items() if rooms]
+    n_groups = len(groups)
+    source, sink = 0, n_groups + n_rooms + 1 # then categories, then rooms
+    n = sink + 1
+    capacity = [ [0] * n for i in range(n) ]
+    for g, (rooms, pids) in enumerate(groups):
+        capacity[source][1 + g] = len(pids)
+        for room in rooms:
+            capacity[1 + g][1 + n_groups + room] = len(pids)
+    total = sum(len(pids) for rooms, pids in groups)
+    max_size = get_assignable_room_size(pid_groups, n_rooms)
+    flow = [ [0] * n for i in range(n) ]
+    while True:
+        for room in range(n_rooms):
+            capacity[1 + n_groups + room][sink] = max_size
+        augment_flow(capacity, flow, source, sink)
+        short = total - sum(flow[source])
+        if short <= 0:
+            break
+        max_size += int(math.ceil(short / n_rooms))
+    if previous_rooms:
+        flow = get_min_move_flow(groups, n_rooms, max_size, previous_rooms)
+    paper_rooms = [ [] for room in range(n_rooms) ]
+    for g, (rooms, pids) in enumerate(groups):
+        counts = {room: flow[1 + g][1 + n_groups + room] for room in rooms}
+        rest = []
+        if previous_rooms:
+            for pid in pids:
+                room = previous_rooms.get(pid)
+                if counts.get(room):
+                    paper_rooms[room].append(pid)
+                    counts[room] -= 1
+                else:
+                    rest.append(pid)
+        else:
+            rest = pids
+        k = 0
+        for room in rooms:
+            paper_rooms[room] += rest[k:k + counts[room]]
+            k += counts[room]
+    return paper_rooms
+
+# The flow (as a matrix on the nodes of flow_assign_groups_to_rooms) that fits
+# the categories in rooms of max_size with the fewest papers moved out of
+# their previous rooms.
+def get_min_move_flow(groups, n_rooms, max_size, previous_rooms):
+    n_groups = len(groups)
+    source, sink = 0, n_groups + n_rooms + 1
+    arcs = []
+    for g, (rooms, pids) in enumerate(groups):
+        arcs.append((source, 1 + g, len(pids), 0))
+        kept = Counter(previous_rooms.get(pid) for pid in pids)
+        for room in rooms:
+            arcs.append((1 + g, 1 + n_groups + room, kept[room], 0)) # papers staying put are free
+            arcs.append((1 + g, 1 + n_groups + room, len(pids), 1)) # others cost a move
+    for room in range(n_rooms):
+        arcs.append((1 + n_groups + room, sink, max_size, 0))
+    n = sink + 1
+    flow = [ [0] * n for i in range(n) ]
+    for (u, v, capacity, cost), f in zip(arcs, min_cost_flow(n, arcs, source, sink)):
+        flow[u][v] += f
+    return flow
+
+# Like assign_papers_to_rooms, for any number of rounds (flow balancer only).
+def assign_papers_to_round_rooms(reviewers, papers, partitions, rng=random, max_excess=0, counters=None,
+                                 loads=None):
+    if counters is None:
+        counters = new_trial_counters()
+    start = time.perf_counter()
+    for partition in partitions[1:]:
+        assign_people_missing_from_XY(reviewers, partition, rng, loads)
+    pid_groups = classify_papers_rounds(papers, partitions)
+    start = add_stage_time(counters, 'classify', start)
+    n_rooms = 2 * len(partitions)
+    paper_rooms = flow_assign_groups_to_rooms(pid_groups, n_rooms)
+    add_stage_time(counters, 'balance', start)
+    excess = max(0, max(len(room) for room in paper_rooms) - get_assignable_room_size(pid_groups, n_rooms))
+    if excess > max_excess:
+        return None, None
+    return paper_rooms, excess
+
+# Same contract as run_trial, for options['rounds'] rounds. The 'partition2'
+# stage time covers all rounds after the first.
+def run_rounds_trial(graph, reviewers, papers, seed, max_cut_cost, options, counters, incumbent=None):
+    rng = random.Random(seed)
+    engine = options['engine']
+    start = time.perf_counter()
+    partitions = []
+    subgraph = graph
+    for k in range(options['rounds']):
+        if k:
+            subgraph = make_subgraph_from_cut(subgraph, partitions[-1])
+            start = add_stage_time(counters, 'subgraph', start)
+        initial = None
+        if incumbent:
+            initial = perturb_split(subgraph, incumbent[k], options['ils'], rng)
+        elif options['spectral']:
+            initial = spectral_split(subgraph, options['spectral'], rng)
+        partitions.append(partition_graph(subgraph, rng, engine, initial, options['load_balance']))
+        start = add_stage_time(counters, 'partition2' if k else 'partition1', start)
+    cut_cost = partition_cut_cost(subgraph, partitions[-1])
+    if cut_cost > max_cut_cost: # only worth assigning papers if it might win
+        counters['pruned_cost'] += 1
+        return cut_cost, None, partitions, None
+    loads = get_reviewer_loads(graph) if options['load_balance'] else None
+    paper_rooms, excess = assign_papers_to_round_rooms(reviewers, papers, partitions, rng, options['max_excess'],
+                                                       counters, loads)
+    counters['assigned' if paper_rooms else 'infeasible'] += 1
+    return cut_cost, excess, partitions, paper_rooms
+
+def partition_cut_cost(graph, partition):
+    roomA, roomB, cutC = partition
+    weight = graph['weight']
+    cut_cost = sum(weight[e] for e in cutC)
+    return cut_cost
+
+# Per-run counters of what happened to each trial: pruned after the second
+# bisection (its Z-cut cannot beat the incumbent), infeasible room balance, or
+# assigned.
+TRIAL_COUNTERS = ['trials', 'pruned_cost', 'infeasible', 'assigned']
+
+# Calls to the SAT solver (--balancer sat or check), and how many had no solution.
+SOLVER_COUNTERS = ['sat_calls', 'sat_failures']
+
+# Stages of a trial whose time (in seconds, summed over all trials) is kept in
+# the counters as 'time_' + stage: the two bisections, building the subgraph,
+# classifying papers and balancing rooms.
+TRIAL_STAGES = ['partition1', 'subgraph', 'partition2', 'classify', 'balance']
+
+def new_trial_counters():
+    counters = dict.fromkeys(TRIAL_COUNTERS + SOLVER_COUNTERS, 0)
+    counters.update(dict.fromkeys(['time_' + stage for stage in TRIAL_STAGES], 0.0))
+    return counters
+
+# Adds the time since start to a stage, and returns the time now (the start of
+# the next stage).
+def add_stage_time(counters, stage, start):
+    now = time.perf_counter()
+    counters['time_' + stage] += now - start
+    return now
+
+def add_trial_counters(total, counters):
+    for key in counters:
+        total[key] = total.get(key, 0) + counters[key]
+
+def log_trial_counters(counters):
+    counts = ', '.join(f'{key} {counters[key]}' for key in TRIAL_COUNTERS)
+    logger.info(f'Trial counts: {counts}')
+
+def log_stage_times(counters):
+    times = ', '.join(f'{stage} {counters["time_" + stage]:.2f}s' for stage in TRIAL_STAGES)
+    logger.info(f'Stage times: {times}')
+    if counters['sat_calls']:
+        logger.info(f'SAT calls: {counters["sat_calls"]}, without a solution: {counters["sat_failures"]}')
+
+# Each trial is fully determined by its seed: trial i of a run uses seed
+# base_seed + i, so any reported result can be rerun with --seed SEED --trials 1.
+# (With --ils, a trial also depends on the earlier trials in its chain, so it is
+# reproduced by rerunning with the same base seed and chain length.)
+def get_trial_seed(base_seed, i):
+    return base_seed + i
+
+# Options that change how a trial runs (see parse_args for their meaning).
+DEFAULT_TRIAL_OPTIONS = {
+    'engine': 'csr',
+    'balancer': 'flow',
+    'max_excess': 0,
+    'ils': 0.0,
+    'ils_chain': 50,
+    'spectral': 0.0,
+    'rounds': 2,
+    'load_balance': None,
+}
+
+# Load tolerance that --load-balance uses when given without a value.
+LOAD_BALANCE_TOLERANCE = 0.01
+
+# With one round every paper has a single room it can go to, so the two rooms
+# only come near the cap when the bisection balances paper loads: load_balance
+# None means on for one round and off otherwise.
+def get_trial_options(options=None):
+    trial_options = dict(DEFAULT_TRIAL_OPTIONS)
+    if options:
+        trial_options.update(options)
+    if trial_options['load_balance'] is None:
+        trial_options['load_balance'] = LOAD_BALANCE_TOLERANCE if trial_options['rounds'] == 1 else 0.0
+    return trial_options
+
+# Returns (cut_cost, excess, partitions, paper_rooms). paper_rooms is None if
+# the trial was pruned or infeasible. If incumbent partitions are given, both
+# bisections start from perturbed copies of them rather than random splits.
+def run_trial(graph, reviewers, papers, seed, max_cut_cost=BIG_COST, options=DEFAULT_TRIAL_OPTIONS, counters=None,
+              incumbent=None):
+    if counters is None:
+        counters = new_trial_counters()
+    counters['trials'] += 1
+    if options['rounds'] != 2:
+        return run_rounds_trial(graph, reviewers, papers, seed, max_cut_cost, options, counters, incumbent)
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    engine = options['engine']
+    initial1, initial2 = None, None
+    if incumbent:
+        initial1 = perturb_split(graph, incumbent[0], options['ils'], rng)
+    elif options['spectral']:
+        initial1 = spectral_split(graph, options['spectral'], rng)
+    partition1 = partition_graph(graph, rng, engine, initial1, options['load_balance'])
+    start = add_stage_time(counters, 'partition1', start)
+    subgraph = make_subgraph_from_cut(graph, partition1)
+    start = add_stage_time(counters, 'subgraph', start)
+    if incumbent:
+        initial2 = perturb_split(subgraph, incumbent[1], options['ils'], rng)
+    elif options['spectral']:
+        initial2 = spectral_split(subgraph, options['spectral'], rng)
+    partition2 = partition_graph(subgraph, rng, engine, initial2, options['load_balance'])
+    cut_cost = partition_cut_cost(subgraph, partition2)
+    add_stage_time(counters, 'partition2', start)
+    paper_rooms, excess = None, None
+    if cut_cost > max_cut_cost: # only worth assigning papers if it might win
+        counters['pruned_cost'] += 1
+    else:
+        loads = get_reviewer_loads(graph) if options['load_balance'] else None
+        paper_rooms, excess = assign_papers_to_rooms(reviewers, papers, partition1, partition2, rng,
+                                                     options['balancer'], options['max_excess'], counters, loads)
+        counters['assigned' if paper_rooms else 'infeasible'] += 1
+    return cut_cost, excess, [partition1, partition2], paper_rooms
+
+# A trial result is (cut_cost, excess, iter, seed, partitions, paper_rooms).
+# Lower cost wins, then better room balance, and ties go to the earlier trial,
+# so the best result of a run does not depend on how trials were sharded
+# across workers.
+def is_better_trial(result, best):
+    if best is None:
+        return True
+    return result[:3] < best[:3]
+
+# Per-process state for trial workers, set once by init_trial_worker() so the
+# graph is not sent along with every chunk of trials.
+_trial_state = {}
+
+def init_trial_worker(graph, reviewers, papers, base_seed, shared_min_cost, options, deadline=None, metrics=False):
+    _trial_state.update(make_trial_state(graph, reviewers, papers, base_seed, shared_min_cost, options, deadline,
+                                         metrics))
+
+# Builds the caches on graph that trials with these options read (the CSR
+# copy, the Fiedler vector, the reviewer loads), once here rather than in
+# every worker.
+def prepare_graph_for_trials(graph, options):
+    if options['engine'] != 'networkx' or options['spectral'] or options['load_balance']:
+        get_csr_graph(graph)
+    if options['spectral']:
+        get_fiedler_vector(graph)
+    if options['load_balance']:
+        get_reviewer_loads(graph)
+
+def make_trial_state(graph, reviewers, papers, base_seed, shared_min_cost, options, deadline=None, metrics=False):
+    return {
+        'graph': graph,
+        'reviewers': reviewers,
+        'papers': papers,
+        'base_seed': base_seed,
+        'shared_min_cost': shared_min_cost,
+        'options': options,
+        'deadline': deadline,
+        'metrics': metrics,
+    }
+
+# Pool workers leave Ctrl-C to the parent, which stops the run and keeps the
+# best result so far.
+def init_pool_trial_worker(*init_args):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_trial_worker(*init_args)
+
+def update_shared_min_cost(shared_min_cost, cut_cost):
+    with shared_min_cost.get_lock():
+        if cut_cost < shared_min_cost.value:
+            shared_min_cost.value = cut_cost
+
+# Runs a contiguous range of trials and returns the best of them (or None),
+# along with the chunk's trial counters. A trial needs its papers assigned
+# only if it could beat both the best in this chunk and the best any worker
+# has found so far.
+#
+# With iterated local search (options['ils'] > 0) a chunk is one chain: its
+# first trial is a random restart, and each later trial perturbs the chain's
+# incumbent, the partitions with the lowest Z-cut so far (ties move the
+# chain on, so it can drift across plateaus).
+#
+# If the workers were set up with metrics, the chunk also returns a record of
+# each trial (see make_trial_record), else an empty list. The trials are those
+# of the worker's run, or of state (from make_trial_state) if given.
+def run_trial_chunk(trial_range, state=None):
+    if state is None:
+        state = _trial_state
+    graph = state['graph']
+    reviewers = state['reviewers']
+    papers = state['papers']
+    base_seed = state['base_seed']
+    shared_min_cost = state['shared_min_cost']
+    options = state['options']
+    deadline = state['deadline']
+    metrics = state['metrics']
+    counters = new_trial_counters()
+    records = []
+    best = None
+    chain = None # (cut_cost, partitions) of the ILS chain's incumbent
+    for i in trial_range:
+        if deadline and time.time() >= deadline:
+            break
+        seed = get_trial_seed(base_seed, i)
+        max_cut_cost = shared_min_cost.value
+        if best:
+            # an equal cost can still win if it balances the rooms better
+            max_cut_cost = min(max_cut_cost, best[0] - 1 if best[1] == 0 else best[0])
+        incumbent = chain[1] if chain else None
+        before = dict(counters) if metrics else None
+        start = time.perf_counter()
+        cut_cost, excess, partitions, paper_rooms = run_trial(graph, reviewers, papers, seed, max_cut_cost, options,
+                                                              counters, incumbent)
+        if metrics:
+            trial = (cut_cost, excess, partitions, paper_rooms)
+            records.append(make_trial_record(graph, i, seed, trial, before, counters, time.perf_counter() - start))
+        if options['ils'] and cut_cost is not None and (chain is None or cut_cost <= chain[0]):
+            chain = (cut_cost, partitions)
+        if paper_rooms:
+            result = (cut_cost, excess, i, seed, partitions, paper_rooms)
+            if is_better_trial(result, best):
+                best = result
+                update_shared_min_cost(shared_min_cost, cut_cost)
+    return best, counters, trial_range, records
+
+# Batch runs (batch-pc-rooms.py) share one pool among several runs, so each
+# worker holds the trial state of every run, by name, and a task is a
+# (name, trial range) pair.
+_batch_states = {}
+
+def init_batch_worker(states, pool=True):
+    if pool:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _batch_states.update(states)
+
+def run_batch_chunk(task):
+    name, trial_range = task
+    return name, run_trial_chunk(trial_range, _batch_states[name])
+
+# Per-trial metrics: how the trial ended (one of TRIAL_COUNTERS), the costs of
+# Cut C and Cut Z, and its room sizes and excess over the quarter cap if its papers were assigned.
+TRIAL_RECORD_FIELDS = ['iter', 'seed', 'status', 'cut1', 'cost', 'excess', 'room_sizes', 'seconds']
+
+def make_trial_record(graph, i, seed, trial, before, counters, seconds):
+    cut_cost, excess, partitions, paper_rooms = trial
+    status = next(key for key in TRIAL_COUNTERS[1:] if counters[key] != before[key])
+    return {
+        'iter': i,
+        'seed': seed,
+        'status': status,
+        'cut1': partition_cut_cost(graph, partitions[0]),
+        'cost': cut_cost,
+        'excess': excess,
+        'room_sizes': [len(room) for room in paper_rooms] if paper_rooms else None,
+        'seconds': round(seconds, 6),
+    }
+
+# Writes the counters (with stage times) and per-trial records of a run, as
+# JSON, or just the trial records as CSV if fname ends with .csv.
+def write_metrics_file(fname, metrics):
+    with open(fname, 'w') as f:
+        if not fname.endswith('.csv'):
+            json.dump(metrics, f, indent=1)
+            return
+        f.write(','.join(TRIAL_RECORD_FIELDS) + '\n')
+        for record in metrics['trials']:
+            values = []
+            for field in TRIAL_RECORD_FIELDS:
+                value = record[field]
+                if value is None:
+                    value = ''
+                elif field == 'room_sizes':
+                    value = ' '.join(str(size) for size in value)
+                values.append(str(value))
+            f.write(','.join(values) + '\n')
+
+# Small chunks let the run report (and stop) promptly; big ones cost less IPC.
+# The parent only sees a chunk's trials when the whole chunk is done, so chunks
+# are capped at MAX_TRIAL_CHUNK trials: otherwise Ctrl-C, checkpoints and the
+# time budget could wait minutes on a big run and find no finished trials.
+MAX_TRIAL_CHUNK = 8
+
+def get_trial_chunk_size(num_trials, workers, options=DEFAULT_TRIAL_OPTIONS, stop_early=False):
+    if options['ils']:
+        return options['ils_chain'] # one chain per chunk, for any worker count
+    if workers == 1 or num_trials is None or stop_early:
+        return 1 # report every improvement as it happens
+    return max(1, min(MAX_TRIAL_CHUNK, num_trials // (workers * 8)))
+
+# Yields ranges of trial indices from start; num_trials None means no limit.
+def generate_trial_chunks(num_trials, chunk_size, start=0):
+    i = start
+    while num_trials is None or i < num_trials:
+        end = i + chunk_size
+        if num_trials is not None:
+            end = min(end, num_trials)
+        yield range(i, end)
+        i = end
+
+# Like pool.imap_unordered, but keeps at most max_pending tasks queued, so the
+# tasks may come from an endless generator and the run can stop at any time.
+def imap_unordered_bounded(pool, func, tasks, max_pending):
+    done = queue.Queue()
+    pending = 0
+    tasks = iter(tasks)
+    while True:
+        while pending < max_pending:
+            task = next(tasks, None)
+            if task is None:
+                break
+            pool.apply_async(func, (task,), callback=done.put, error_callback=done.put)
+            pending += 1
+        if not pending:
+            return
+        result = done.get()
+        pending -= 1
+        if isinstance(result, BaseException):
+            raise result
+        yield result
+
+def get_worker_count(workers):
+    if workers < 1:
+        return os.cpu_count() or 1
+    return workers
+
+def log_trial(result):
+    cut_cost, excess, i, seed, partitions, paper_rooms = result
+    min_sizes = [len(r) for r in paper_rooms]
+    if excess:
+        logger.info(f'iter: {i} seed: {seed} cost: {cut_cost} rooms sizes: {min_sizes} ({excess} over quarter cap)')
+    else:
+        logger.info(f'iter: {i} seed: {seed} cost: {cut_cost} rooms sizes: {min_sizes}')
+
+# Writes a new incumbent as one JSON line, so a long run can be watched (or
+# its latest answer picked up) while it is still going.
+def stream_trial(stream, result, start_time):
+    cut_cost, excess, i, seed, partitions, paper_rooms = result
+    record = {
+        'iter': i,
+        'seed': seed,
+        'cost': cut_cost,
+        'excess': excess,
+        'room_sizes': [len(r) for r in paper_rooms],
+        'elapsed': round(time.time() - start_time, 3),
+    }
+    stream.write(json.dumps(record) + '\n')
+    stream.flush()
+
+# A checkpoint saves a run's base seed and options, the trial index below which
+# every trial has run, the best result so far and the counters, as JSON. Since
+# each trial depends only on its seed (and, with ILS, its chain, which is never
+# split by a checkpoint), resuming from it and running on gives the same best
+# result as one uninterrupted run, and a finished run can be extended later.
+# It also saves a fingerprint of the graph, so it is only resumed on the same
+# input.
+CHECKPOINT_VERSION = 3
+FINGERPRINT_ARRAYS = ['src', 'dst', 'third', 'weight', 'pid_offsets', 'pid_index']
+
+# Whether any paper of the graph has three reviewers (so it was read with third).
+def has_hyperedges(graph):
+    return any(t >= 0 for t in graph['third'])
+
+# Edge count and a hash of the graph's reviewers, papers and edges.
+def get_graph_fingerprint(graph):
+    digest = hashlib.sha1()
+    for key in ['reviewers', 'pids']:
+        digest.update('\n'.join(graph[key]).encode() + b'\0')
+    for key in FINGERPRINT_ARRAYS:
+        digest.update(graph[key].tobytes())
+    return f'{len(graph["src"])}:{digest.hexdigest()}'
+
+def make_trials_checkpoint(graph, reviewers, papers, seed, options, next_trial, best, counters):
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'graph': get_graph_fingerprint(graph),
+        'third': has_hyperedges(graph),
+        'reviewers': len(reviewers),
+        'papers': len(papers),
+        'seed': seed,
+        'options': options,
+        'next_trial': next_trial,
+        'counters': counters,
+        'best': None,
+    }
+    if best:
+        cut_cost, excess, i, trial_seed, partitions, paper_rooms = best
+        checkpoint['best'] = {
+            'cost': cut_cost,
+            'excess': excess,
+            'iter': i,
+            'seed': trial_seed,
+            'partitions': partitions,
+            'paper_rooms': paper_rooms,
+        }
+    return checkpoint
+
+def write_trials_checkpoint(fname, checkpoint):
+    temp_fname = fname + '.tmp'
+    with open(temp_fname, 'w') as f:
+        json.dump(checkpoint, f, separators=(',', ':'))
+    os.replace(temp_fname, fname) # never leave a half-written checkpoint
+
+def read_trials_checkpoint(fname):
+    with open(fname) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        halt_with_error(f'checkpoint {fname} has an unknown version')
+    return checkpoint
+
+def get_checkpoint_best(checkpoint):
+    saved = checkpoint['best']
+    if not saved:
+        return None
+    partitions = [(room0, room1, cut) for room0, room1, cut in saved['partitions']]
+    return (saved['cost'], saved['excess'], saved['iter'], saved['seed'], partitions, saved['paper_rooms'])
+
+# Runs num_trials trials (None for no limit), or fewer if the run stops early:
+# after time_budget seconds, after patience trials in a row with no new best,
+# or on Ctrl-C. Each new best is printed, and also written as a JSON line to
+# stream if given. With a checkpoint file name, the run's state is saved there
+# every checkpoint_every seconds and at the end; resume is a checkpoint (from
+# read_trials_checkpoint) to continue from. With validate, every new best is
+# checked with validate_trial, and the run halts if it breaks an invariant.
+# If metrics is a dict, the run's counters and a record of every trial (in
+# trial order) are stored in it as 'counters' and 'trials'.
+def partition_ABXY_trials(graph, reviewers, papers, num_trials=1000, seed=None, workers=1, options=None,
+                          time_budget=None, patience=None, stream=None,
+                          checkpoint=None, checkpoint_every=60, resume=None, validate=False, metrics=None):
+    options = get_trial_options(options)
+    best = None
+    next_trial = 0
+    counters = new_trial_counters()
+    if resume:
+        if resume['third'] != has_hyperedges(graph):
+            halt_with_error(f'checkpoint was made {"with" if resume["third"] else "without"} --third')
+        if resume['graph'] != get_graph_fingerprint(graph):
+            halt_with_error('checkpoint was made from different input data')
+        seed = resume['seed']
+        options = get_trial_options(resume['options'])
+        next_trial = resume['next_trial']
+        best = get_checkpoint_best(resume)
+        add_trial_counters(counters, resume['counters'])
+    if seed is None:
+        seed = random.randrange(MAX_SEED)
+    workers = get_worker_count(workers)
+    start_time = time.time()
+    deadline = start_time + time_budget if time_budget else None
+    chunk_size = get_trial_chunk_size(num_trials, workers, options, bool(time_budget or patience))
+    chunks = generate_trial_chunks(num_trials, chunk_size, next_trial)
+    shared_min_cost = multiprocessing.Value('l', best[0] if best else BIG_COST)
+    prepare_graph_for_trials(graph, options)
+    init_args = (graph, reviewers, papers, seed, shared_min_cost, options, deadline, metrics is not None)
+    records = []
+    pool = None
+    if workers == 1:
+        init_trial_worker(*init_args)
+        results = map(run_trial_chunk, chunks)
+    else:
+        pool = multiprocessing.Pool(workers, initializer=init_pool_trial_worker, initargs=init_args)
+        results = imap_unordered_bounded(pool, run_trial_chunk, chunks, 2 * workers)
+    finished_chunks = {} # start -> end of chunks finished out of order
+    last_checkpoint_time = start_time
+    trials_since_best = 0
+    try:
+        for result, chunk_counters, trial_range, chunk_records in results:
+            add_trial_counters(counters, chunk_counters)
+            records += chunk_records
+            trials_since_best += chunk_counters['trials']
+            if chunk_counters['trials'] == len(trial_range): # not cut short by the deadline
+                finished_chunks[trial_range.start] = trial_range.stop
+                while next_trial in finished_chunks:
+                    next_trial = finished_chunks.pop(next_trial)
+            if result and is_better_trial(result, best):
+                if validate:
+                    validate_trial(graph, reviewers, papers, result)
+                best = result
+                trials_since_best = 0
+                log_trial(best)
+                if stream:
+                    stream_trial(stream, best, start_time)
+            if checkpoint and time.time() - last_checkpoint_time >= checkpoint_every:
+                write_trials_checkpoint(checkpoint, make_trials_checkpoint(graph, reviewers, papers, seed, options,
+                                                                           next_trial, best, counters))
+                last_checkpoint_time = time.time()
+            if deadline and time.time() >= deadline:
+                logger.info(f'Stopping: time budget of {time_budget} seconds used up.')
+                break
+            if patience and trials_since_best >= patience:
+                logger.info(f'Stopping: no improvement in {trials_since_best} trials.')
+                break
+    except KeyboardInterrupt:
+        logger.warning('Interrupted -- keeping the best result so far.')
+    finally:
+        if pool:
+            pool.terminate()
+    if checkpoint:
+        write_trials_checkpoint(checkpoint, make_trials_checkpoint(graph, reviewers, papers, seed, options,
+                                                                   next_trial, best, counters))
+        logger.info(f'Saved checkpoint at trial {next_trial} to {checkpoint}')
+    log_trial_counters(counters)
+    log_stage_times(counters)
+    if metrics is not None:
+        metrics['counters'] = counters
+        metrics['trials'] = sorted(records, key=lambda record: record['iter'])
+    if not best:
+        return None, None
+    return best[4], best[5] # partitions, paper_rooms
+
+# Repair mode: after late withdrawals or reviewer changes, fix up the previous
+# room assignments instead of rerunning all the trials. Reviewers keep their
+# rooms, and new reviewers are placed where the fewest of their papers end up
+# in plenary. Then reviewers on changed papers may move if that sends fewer
+# papers to plenary. Finally, papers are rebalanced across rooms with a
+# min-cost flow that keeps as many papers as possible in their previous room.
+
+def read_rooms_file(fname):
+    rooms = {}
+    problems = []
+    for item, room in read_rooms_rows(fname, problems):
+        rooms[item] = rooms.get(item, '') + room
+    log_problems(fname, problems)
+    return rooms
+
+# Maps each reviewer to the other reviewers of each of their papers (a tuple
+# per paper).
+def get_co_reviewers(papers):
+    co_reviewers = {}
+    for revs in papers.values():
+        for rev in revs:
+            co_reviewers.setdefault(rev, []).append(tuple(other for other in revs if other != rev))
+    return co_reviewers
+
+# A paper is in plenary iff its reviewers are split in both rounds.
+def count_plenary_papers_of(rev, ab, xy, co_reviewers, rev_ab=None, rev_xy=None):
+    rev_ab = ab[rev] if rev_ab is None else rev_ab
+    rev_xy = xy[rev] if rev_xy is None else rev_xy
+    count = 0
+    for others in co_reviewers.get(rev, []):
+        if all(other in ab for other in others) and any(ab[other] != rev_ab for other in others) and \
+                any(xy[other] != rev_xy for other in others):
+            count += 1
+    return count
+
+def place_new_reviewer(rev, ab, xy, co_reviewers, room_sizes):
+    options = []
+    for rev_ab in (0, 1):
+        for rev_xy in (0, 1):
+            plenary = count_plenary_papers_of(rev, ab, xy, co_reviewers, rev_ab, rev_xy)
+            options.append((plenary, room_sizes[rev_ab] + room_sizes[2 + rev_xy], rev_ab, rev_xy))
+    plenary, size, ab[rev], xy[rev] = min(options)
+    room_sizes[ab[rev]] += 1
+    room_sizes[2 + xy[rev]] += 1
+
+# Greedy single-reviewer moves (one round at a time) that send fewer papers to
+# plenary, without letting the two rooms of the round drift further apart.
+def move_affected_reviewers(affected, ab, xy, co_reviewers, room_sizes, max_passes=10):
+    moved = set()
+    for i in range(max_passes):
+        improved = False
+        for rev in affected:
+            for rounds, offset in ((ab, 0), (xy, 2)):
+                old = rounds[rev]
+                new = 1 - old
+                imbalance = abs(room_sizes[offset] - room_sizes[offset + 1])
+                new_imbalance = abs((room_sizes[offset + new] + 1) - (room_sizes[offset + old] - 1))
+                if new_imbalance > max(imbalance, 1):
+                    continue
+                before = count_plenary_papers_of(rev, ab, xy, co_reviewers)
+                rounds[rev] = new
+                if count_plenary_papers_of(rev, ab, xy, co_reviewers) < before:
+                    room_sizes[offset + old] -= 1
+                    room_sizes[offset + new] += 1
+                    moved.add(rev)
+                    improved = True
+                else:
+                    rounds[rev] = old
+        if not improved:
+            break
+    return moved
+
+# Successive-shortest-path min-cost flow on a small graph given as a list of
+# arcs (u, v, capacity, cost). Returns the flow on each arc.
+def min_cost_flow(n, arcs, source, sink):
+    graph = [ [] for i in range(n) ]
+    edges = [] # [to, residual capacity, cost, index of reverse edge]
+    for u, v, capacity, cost in arcs:
+        graph[u].append(len(edges))
+        edges.append([v, capacity, cost, len(edges) + 1])
+        graph[v].append(len(edges))
+        edges.append([u, 0, -cost, len(edges) - 1])
+    while True:
+        dist = [None] * n
+        via = [None] * n
+        dist[source] = 0
+        for i in range(n): # Bellman-Ford (costs may be negative on reverse edges)
+            for u in range(n):
+                if dist[u] is None:
+                    continue
+                for e in graph[u]:
+                    v, residual, cost, rev = edges[e]
+                    if residual > 0 and (dist[v] is None or dist[u] + cost < dist[v]):
+                        dist[v] = dist[u] + cost
+                        via[v] = e
+        if dist[sink] is None:
+            break
+        path = []
+        v = sink
+        while v != source:
+            e = via[v]
+            path.append(e)
+            v = edges[edges[e][3]][0]
+        push = min(edges[e][1] for e in path)
+        for e in path:
+            edges[e][1] -= push
+            edges[edges[e][3]][1] += push
+    return [edges[2 * i + 1][1] for i in range(len(arcs))] # flow = reverse residual
+
+# Like flow_assign_pids_to_rooms, but among the assignments that meet the
+# tightest balance (plus max_excess), picks one that moves the fewest papers
+# away from their previous room (a paper's room is a letter in ROOM_LABELS).
+def repair_assign_pids_to_rooms(pid_lists, previous_rooms, max_excess=0):
+    max_size = get_min_max_room_size(pid_lists) + max_excess
+    fixed = get_fixed_room_counts(pid_lists)
+    source, sink = 0, 9 # nodes 1-4 are categories 0-3, nodes 5-8 are rooms 0-3
+    arcs = []
+    for i in range(4):
+        arcs.append((source, 1 + i, len(pid_lists[i]), 0))
+        for room in LIST_OPTIONS[i]:
+            label = ROOM_LABELS[room]
+            kept = sum(1 for pid in pid_lists[i] if previous_rooms.get(pid) == label)
+            arcs.append((1 + i, 5 + room, kept, 0)) # papers staying put are free
+            arcs.append((1 + i, 5 + room, len(pid_lists[i]), 1)) # others cost a move
+    for room in range(4):
+        arcs.append((5 + room, sink, max(0, max_size - fixed[room]), 0))
+    flow = min_cost_flow(10, arcs, source, sink)
+    paper_rooms = assign_fixed_pids_to_rooms(pid_lists)
+    for i in range(4):
+        neg,pos = get_neg_and_pos(i)
+        count_neg = sum(f for (u, v, c, cost), f in zip(arcs, flow) if u == 1 + i and v == 5 + neg)
+        neg_label = ROOM_LABELS[neg]
+        pos_label = ROOM_LABELS[pos]
+        # fill neg with papers that were there, then new ones, then those from pos
+        order = sorted(pid_lists[i], key=lambda pid: 0 if previous_rooms.get(pid) == neg_label else
+                                                    2 if previous_rooms.get(pid) == pos_label else 1)
+        paper_rooms[neg] += order[:count_neg]
+        paper_rooms[pos] += order[count_neg:]
+    return paper_rooms
+
+# Returns reviewer_rooms (A,B,X,Y), paper_rooms (A,B,X,Y) and the plenary pids
+# for the new input, starting from the previous people and paper rooms (as read
+# by read_rooms_file).
+def repair_room_assignments(reviewers, papers, people_rooms, previous_rooms, max_excess=0):
+    ab = {}
+    xy = {}
+    for rev in reviewers:
+        rooms = people_rooms.get(rev, '')
+        if len(rooms) == 2 and rooms[0] in 'AB' and rooms[1] in 'XY':
+            ab[rev] = 'AB'.index(rooms[0])
+            xy[rev] = 'XY'.index(rooms[1])
+    room_sizes = [0, 0, 0, 0]
+    for rev in ab:
+        room_sizes[ab[rev]] += 1
+        room_sizes[2 + xy[rev]] += 1
+    co_reviewers = get_co_reviewers(papers)
+    new_reviewers = [rev for rev in reviewers if rev not in ab]
+    for rev in new_reviewers:
+        place_new_reviewer(rev, ab, xy, co_reviewers, room_sizes)
+    # a paper needs attention if it is new, or its reviewers no longer share
+    # the room it was in (so one of them changed)
+    affected = dict.fromkeys(new_reviewers)
+    for pid, revs in papers.items():
+        room = previous_rooms.get(pid)
+        if room in ('A', 'B'):
+            ok = all(ab[rev] == 'AB'.index(room) for rev in revs)
+        elif room in ('X', 'Y'):
+            ok = all(xy[rev] == 'XY'.index(room) for rev in revs)
+        else:
+            ok = room == 'P'
+        if not ok:
+            affected.update(dict.fromkeys(revs))
+    moved = move_affected_reviewers(list(affected), ab, xy, co_reviewers, room_sizes)
+    reviewer_rooms = [ [], [], [], [] ]
+    for rev in reviewers:
+        reviewer_rooms[ab[rev]].append(rev)
+        reviewer_rooms[2 + xy[rev]].append(rev)
+    partition1 = (reviewer_rooms[0], reviewer_rooms[1], []) # cut edges are not needed to classify
+    partition2 = (reviewer_rooms[2], reviewer_rooms[3], [])
+    pid_lists = classify_papers_ABCXYZ(papers, partition1, partition2)
+    paper_rooms = repair_assign_pids_to_rooms(pid_lists, previous_rooms, max_excess)
+    pids_in_cut = pid_lists[CZ]
+    moved_papers = 0
+    for i, room in enumerate(paper_rooms):
+        moved_papers += sum(1 for pid in room if previous_rooms.get(pid, ROOM_LABELS[i]) != ROOM_LABELS[i])
+    moved_papers += sum(1 for pid in pids_in_cut if previous_rooms.get(pid, 'P') != 'P')
+    new_papers = sum(1 for pid in papers if pid not in previous_rooms)
+    logger.info(f'Repair: placed {len(new_reviewers)} new reviewers, moved {len(moved)} reviewers, '
+                f'moved {moved_papers} papers, added {new_papers} new papers')
+    return reviewer_rooms, paper_rooms, pids_in_cut
+
+# This function is called to validate both reviewers and papers.
+# Variables are named for reviewers, but the same works for papers. It takes
+# one pass over the rooms and one over the reviewers, and returns a summary:
+# how many reviewers are in no room, in more than one, and how many room
+# occupants are not among the reviewers at all.
+def validate_room_count_is_one(reviewers, reviewer_rooms, label, verbose=True):
+    counts = Counter()
+    for room in reviewer_rooms:
+        counts.update(room)
+    summary = {'label': label, 'count': len(reviewers), 'missing': 0, 'repeated': 0, 'unknown': 0}
+    # ensure each reviewer is in exactly one room
+    for rev in reviewers:
+        count = counts[rev]
+        if count != 1:
+            summary['missing' if count == 0 else 'repeated'] += 1
+            if verbose:
+                logger.warning(f'{label} {rev} is in {count} rooms (should be 1)')
+    # next ensure each room occupant is one of our reviewers
+    known = reviewers if isinstance(reviewers, (dict, set)) else set(reviewers)
+    for p in counts:
+        if p not in known:
+            summary['unknown'] += 1
+            if verbose:
+                logger.warning(f'{label} {p} is in a room (but not our list of {label}s)')
+    return summary
+
+# Returns a summary with 'ok' and the summaries of the checks (one per round,
+# e.g. 'reviewers_AB', and 'papers'), so it can also be run quietly as an
+# invariant check on every new best trial.
+def validate_paper_rooms(reviewers, papers, reviewer_rooms, paper_rooms, pids_in_cut, verbose=True):
+    rooms_with_cut = paper_rooms + [ pids_in_cut ]
+    summary = {}
+    for k in range(len(reviewer_rooms) // 2): # rooms A,B then X,Y (and so on)
+        summary['reviewers_' + ROUND_ROOM_LABELS[k]] = validate_room_count_is_one(reviewers, reviewer_rooms[2*k:2*k + 2],
+                                                                                 'reviewer', verbose)
+    summary['papers'] = validate_room_count_is_one(papers, rooms_with_cut, 'paper', verbose)
+    ok = all(not (c['missing'] or c['repeated'] or c['unknown']) for c in summary.values())
+    return dict(ok=ok, **summary)
+
+def get_reviewer_rooms(partitions):
+    return [room for partition in partitions for room in partition[:2]]
+
+# Invariant check on a trial result: its reviewers and papers (with those in
+# the last cut going to plenary) are each in exactly one room.
+def validate_trial(graph, reviewers, papers, result):
+    cut_cost, excess, i, seed, partitions, paper_rooms = result
+    reviewer_rooms = get_reviewer_rooms(partitions)
+    pids_in_cut = get_papers_in_graph_cut(graph, partitions[-1][2])
+    summary = validate_paper_rooms(reviewers, papers, reviewer_rooms, paper_rooms, pids_in_cut, verbose=False)
+    if not summary['ok']:
+        raise InvariantError(f'trial {i} (seed {seed}) failed validation: {json.dumps(summary)}')
+    return summary
+
+def add_singles_to_rooms(rooms_by_person, paper_rooms, singles):
+    for pid in singles:
+        logger.debug('checking single '+pid)
+        reviewer = singles[pid]
+        rooms = rooms_by_person[reviewer]
+        room = rooms[0]
+        logger.debug(f'room: {room}')
+        if room == 'A':
+            index = 0
+        elif room == 'B':
+            index = 1
+        else:
+            logger.warning(f'cannot find paper for single {pid} reviewed by reviewer {reviewer}')
+            continue
+        paper_room = paper_rooms[index]
+        paper_room.append(pid)
+        logger.debug(f'add single paper {pid} to room {room} (reviewer {reviewer})')
+
+def dump_string_to_file(fname, lines):
+    logger.info(f'writing {fname}')
+    with open(fname, 'w') as f:
+        f.write(lines)
+
+def format_rooms(rooms, label, extra=None):
+    lines = f'{label},Room\n'
+    room_labels = get_room_labels(len(rooms))
+    for i,room in enumerate(rooms):
+        room_label = room_labels[i]
+        for p in room: # either person or paper
+            lines += f'{p},{room_label}\n'
+    if extra:
+        lines += extra
+    return lines
+
+def consolidate_rooms_by_person(reviewer_rooms):
+    rooms_by_person = {}
+    room_labels = get_room_labels(len(reviewer_rooms))
+    for i,room in enumerate(reviewer_rooms):
+        room_label = room_labels[i]
+        for p in room:
+            if p not in rooms_by_person:
+                rooms_by_person[p] = room_label
+            else:
+                rooms_by_person[p] += room_label
+    return rooms_by_person
+
+def write_people_rooms_file(rooms_by_person, fname='people-rooms.csv'):
+    dump_string_to_file(fname, format_people_rooms(rooms_by_person))
+
+# The contents of people-rooms.csv, as a string.
+def format_people_rooms(rooms_by_person):
+    lines = f'Reviewer,Rooms\n'
+    for p in rooms_by_person:
+        rooms = rooms_by_person[p]
+        lines += f'{p},{rooms}\n'
+    return lines
+
+def write_paper_rooms_file(paper_rooms, pids_in_cut, fname='paper-rooms.csv'):
+    dump_string_to_file(fname, format_paper_rooms(paper_rooms, pids_in_cut))
+
+# The contents of paper-rooms.csv, as a string.
+def format_paper_rooms(paper_rooms, pids_in_cut):
+    lines = ''
+    for pid in pids_in_cut:
+        lines += f'{pid},P\n'
+    return format_rooms(paper_rooms, 'Paper', lines)
+
+def log_room_counts(reviewer_rooms, paper_rooms, pids_in_cut):
+    for i,room_label in enumerate(get_room_labels(len(paper_rooms))):
+        paper_count = len(paper_rooms[i])
+        reviewer_count = len(reviewer_rooms[i])
+        logger.info(f'{i}: Room {room_label} has {paper_count} papers and {reviewer_count} reviewers')
+    logger.info(f'Papers in Plenary:  {len(pids_in_cut)}')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Assign SIGGRAPH PC reviewers and papers to rooms.')
+    parser.add_argument('fname', nargs='?', default='fake-data.csv', help='input CSV file (default fake-data.csv)')
+    parser.add_argument('ntrials', nargs='?', type=int, help='number of trials (default 1000, or no limit with --time-budget)')
+    parser.add_argument('--trials', type=int, dest='trials', help='number of trials (same as ntrials)')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for trials (0 = one per core, default 1)')
+    parser.add_argument('--seed', type=int, help='base seed; trial i uses seed+i (default random)')
+    parser.add_argument('--engine', choices=list(PARTITION_ENGINES), default='csr', help='graph bisection engine (default csr)')
+    parser.add_argument('--balancer', choices=list(BALANCERS), default='flow', help='paper room balancer; check runs flow and SAT (default flow)')
+    parser.add_argument('--max-excess', type=int, default=0, help='papers a room may hold beyond the quarter cap (default 0)')
+    parser.add_argument('--ils', type=float, nargs='?', const=0.2, default=0.0, metavar='FRACTION',
+                        help='iterated local search: swap this fraction of each room of the best partitions per trial '
+                             '(0.2 if no FRACTION; default off)')
+    parser.add_argument('--spectral', type=float, nargs='?', const=0.3, default=0.0, metavar='NOISE',
+                        help='start bisections from noisy median splits of the Fiedler vector, with noise NOISE times '
+                             'its spread (0.3 if no NOISE; default off)')
+    parser.add_argument('--load-balance', type=float, nargs='?', const=LOAD_BALANCE_TOLERANCE, metavar='TOLERANCE',
+                        help='refine each bisection until the paper loads of its sides differ by at most TOLERANCE '
+                             'of their total (0.01 if no TOLERANCE; default on for one round, 0 turns it off)')
+    parser.add_argument('--third', action='store_true', help='keep the Second Secondary reviewer of a paper in its room too')
+    parser.add_argument('--rounds', type=int, default=2, choices=range(1, MAX_ROUNDS + 1), metavar='R',
+                        help=f'rounds of bisection, for 2R rooms (1 to {MAX_ROUNDS}, default 2)')
+    parser.add_argument('--ils-chain', type=int, default=50, help='trials per ILS chain before a random restart (default 50)')
+    parser.add_argument('--time-budget', type=float, metavar='SECONDS', help='stop trials after this many seconds')
+    parser.add_argument('--patience', type=int, metavar='K', help='stop after K trials in a row with no improvement')
+    parser.add_argument('--stream', metavar='FILE', help='write each new best result as a JSON line to FILE (- for stdout)')
+    parser.add_argument('--checkpoint', metavar='FILE', help='save the state of the run to FILE, periodically and at the end')
+    parser.add_argument('--checkpoint-every', type=float, default=60, metavar='SECONDS', help='seconds between checkpoints (default 60)')
+    parser.add_argument('--resume', action='store_true', help='continue the run saved in the --checkpoint file')
+    parser.add_argument('--validate-trials', action='store_true', help='check every new best trial for reviewers or papers not in exactly one room')
+    parser.add_argument('--verify', action='store_true', help='verify the final rooms in-process, as verify-room-assignments.py does')
+    parser.add_argument('--metrics', metavar='FILE', help='write counters, stage times and per-trial metrics to FILE '
+                                                          '(JSON, or CSV of the trials if FILE ends with .csv)')
+    parser.add_argument('--profile', metavar='FILE', help='run under cProfile and write a report of the run to FILE '
+                                                          '(the main process only, so best with --workers 1)')
+    parser.add_argument('--repair', action='store_true', help='fix up previous room assignments for changed input, instead of running trials')
+    parser.add_argument('--previous-people', default='people-rooms.csv', help='previous people rooms for --repair (default people-rooms.csv)')
+    parser.add_argument('--previous-papers', default='paper-rooms.csv', help='previous paper rooms for --repair (default paper-rooms.csv)')
+    args = parser.parse_args()
+    if args.trials is not None:
+        args.ntrials = args.trials
+    if args.ntrials is None and not args.time_budget:
+        args.ntrials = 1000
+    if args.resume and not args.checkpoint:
+        parser.error('--resume needs --checkpoint FILE')
+    if args.rounds != 2 and (args.balancer != 'flow' or args.repair):
+        parser.error('--balancer sat or check and --repair only work with two rounds')
+    if args.seed is None:
+        args.seed = random.randrange(MAX_SEED)
+    return args
+
+# Runs the checks of verify-room-assignments.py on the final rooms, in-process
+# rather than by reading back the CSV files.
+def verify_rooms(papers, singles, rooms_by_person, paper_rooms):
+    data = dict(papers)
+    for pid in singles:
+        data[pid] = (singles[pid],)
+    rooms_by_paper = {}
+    room_labels = get_room_labels(len(paper_rooms))
+    for i,room in enumerate(paper_rooms):
+        for pid in room:
+            rooms_by_paper[pid] = rooms_by_paper.get(pid, '') + room_labels[i]
+    return verify_room_assignments(data, rooms_by_paper, rooms_by_person, len(paper_rooms) // 2)
+
+# The trials stage of the pipeline, on in-memory data: returns reviewer_rooms
+# and paper_rooms (each A,B,X,Y, or the 2R rooms of R rounds) and the pids in
+# plenary, or None if no trial met the room caps. Other keyword arguments are
+# passed to partition_ABXY_trials.
+def assign_rooms(graph, reviewers, papers, num_trials=1000, seed=None, **kwargs):
+    partitions, paper_rooms = partition_ABXY_trials(graph, reviewers, papers, num_trials, seed, **kwargs)
+    if not paper_rooms:
+        return None
+    reviewer_rooms = get_reviewer_rooms(partitions)
+    pids_in_cut = get_papers_in_graph_cut(graph, partitions[-1][2])
+    return reviewer_rooms, paper_rooms, pids_in_cut
+
+# Validates the rooms and adds the singletons to paper_rooms (in place).
+# Returns the rooms of each person (e.g. 'AX') and the validation summary.
+def complete_room_assignments(reviewers, papers, singles, reviewer_rooms, paper_rooms, pids_in_cut):
+    summary = validate_paper_rooms(reviewers, papers, reviewer_rooms, paper_rooms, pids_in_cut)
+    rooms_by_person = consolidate_rooms_by_person(reviewer_rooms)
+    add_singles_to_rooms(rooms_by_person, paper_rooms, singles)
+    return rooms_by_person, summary
+
+# Returns the verify_rooms report if verify is set, else None.
+def write_room_assignments(reviewers, papers, singles, reviewer_rooms, paper_rooms, pids_in_cut, verify=False):
+    rooms_by_person, summary = complete_room_assignments(reviewers, papers, singles, reviewer_rooms, paper_rooms,
+                                                         pids_in_cut)
+    log_room_counts(reviewer_rooms, paper_rooms, pids_in_cut)
+    write_people_rooms_file(rooms_by_person)
+    write_paper_rooms_file(paper_rooms, pids_in_cut)
+    if verify:
+        return verify_rooms(papers, singles, rooms_by_person, paper_rooms)
+    return None
+
+# Prints the --verify report, and exits with status 1 if it found violations.
+def exit_on_failed_verify(report):
+    if report:
+        print_verify_report(report, max_per_category=10)
+        exit_on_violations(report)
+
+def repair_rooms(args, reviewers, papers, singles):
+    logger.info(f'Repairing {args.previous_people} and {args.previous_papers} ...')
+    people_rooms = read_rooms_file(args.previous_people)
+    previous_rooms = read_rooms_file(args.previous_papers)
+    reviewer_rooms, paper_rooms, pids_in_cut = repair_room_assignments(reviewers, papers, people_rooms, previous_rooms,
+                                                                       args.max_excess)
+    exit_on_failed_verify(write_room_assignments(reviewers, papers, singles, reviewer_rooms, paper_rooms, pids_in_cut,
+                                                 args.verify))
+
+# Calls func(*args) for a script's main, and exits with the message of any
+# RoomsError it raises.
+def exit_on_rooms_error(func, *args):
+    try:
+        return func(*args)
+    except RoomsError as error:
+        sys.exit(f'Uh-oh -- {error} Quitting...')
+
+def main():
+    args = parse_args()
+    setup_logging()
+    if args.profile:
+        exit_on_rooms_error(profile_run, run, args)
+    else:
+        exit_on_rooms_error(run, args)
+
+# Runs func(args) under cProfile, and writes the 40 functions with the most
+# cumulative time, and then the most internal time, to args.profile.
+def profile_run(func, args):
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(func, args)
+    finally:
+        with open(args.profile, 'w') as f:
+            stats = pstats.Stats(profiler, stream=f)
+            stats.sort_stats('cumulative').print_stats(40)
+            stats.sort_stats('tottime').print_stats(40)
+        logger.info(f'writing {args.profile}')
+
+def run(args):
+    fname = args.fname
+    ntrials = args.ntrials
+    logger.info(f'Reading {fname} ...')
+    reviewers, papers, singles = read_assignments(fname, args.third)
+    logger.info(f'Input reviewers and papers: {len(reviewers)} {len(papers)}')
+    if args.repair:
+        repair_rooms(args, reviewers, papers, singles)
+        return
+    graph = make_graph_from_paper_reviews(reviewers, papers)
+    workers = get_worker_count(args.workers)
+    resume = None
+    if args.resume and os.path.exists(args.checkpoint):
+        resume = read_trials_checkpoint(args.checkpoint)
+        args.seed = resume['seed']
+        logger.info(f'Resuming from trial {resume["next_trial"]} of {args.checkpoint} (its options replace any given here)')
+    room_labels = get_room_labels(2 * args.rounds)
+    rooms = ','.join(room_labels[:-1]) + ' and ' + room_labels[-1]
+    if ntrials is None:
+        logger.info(f'About to run trials for {args.time_budget} seconds (seed {args.seed}, {workers} workers) for partioning into rooms {rooms}...')
+    else:
+        logger.info(f'About to run {ntrials} trials (seed {args.seed}, {workers} workers) for partioning into rooms {rooms}...')
+    options = {'engine': args.engine, 'balancer': args.balancer, 'max_excess': args.max_excess,
+               'ils': args.ils, 'ils_chain': args.ils_chain,
+               'spectral': args.spectral, 'rounds': args.rounds, 'load_balance': args.load_balance}
+    metrics = {} if args.metrics else None
+    stream = None
+    if args.stream == '-':
+        stream = sys.stdout
+    elif args.stream:
+        stream = open(args.stream, 'w')
+    rooms = assign_rooms(graph, reviewers, papers, ntrials, args.seed, workers=workers, options=options,
+                         time_budget=args.time_budget, patience=args.patience, stream=stream,
+                         checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every, resume=resume,
+                         validate=args.validate_trials, metrics=metrics)
+    if stream and stream is not sys.stdout:
+        stream.close()
+    if metrics is not None:
+        logger.info(f'writing {args.metrics}')
+        write_metrics_file(args.metrics, metrics)
+    if not rooms:
+        halt_with_error('partition failed! (try a larger --max-excess)')
+    reviewer_rooms, paper_rooms, pids_in_cut = rooms
+    exit_on_failed_verify(write_room_assignments(reviewers, papers, singles, reviewer_rooms, paper_rooms, pids_in_cut,
+                                                 args.verify))
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,427 @@
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import socketserver
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+from pc_verify import ROUND_ROOM_LABELS, PLENARY, get_person_rounds
+from pc_data import setup_logging
+from pc_rooms import (MAX_ROUNDS, PARTITION_ENGINES, MAX_SEED, LOAD_BALANCE_TOLERANCE, halt_with_error,
+                      exit_on_rooms_error, read_assignments, make_graph_from_paper_reviews, get_csr_graph, assign_rooms,
+                      get_trial_options, get_room_labels,
+                      make_subgraph_from_cut, make_room_index, repartition_graph, perturb_split, classify_papers_rounds,
+                      flow_assign_groups_to_rooms, get_assignable_room_size, complete_room_assignments,
+                      format_people_rooms, format_paper_rooms, read_rooms_file)
+
+# What-if service behind serve-pc-rooms.py (see README.md). It reads the input
+# once, finds rooms with the usual trials (or starts from earlier room files),
+# and then keeps the graph and that incumbent in memory to answer questions
+# like "what if reviewer r17 must be in room A" over HTTP (or a Unix socket).
+#
+# A what-if is a set of constraints, as a JSON object:
+#
+#   {"pin": {"r17": "A"},            reviewer must be in room A
+#    "forbid": {"r3": ["X"]},        reviewer must not be in room X
+#    "papers": {"p12": "B"},         paper (and so its reviewers) must be in room B
+#    "plenary": ["p4", "p9"],        papers that must go to plenary
+#    "keep": false,                  true makes the answer the new incumbent
+#    "tries": 1,                     restarts from perturbed incumbents to try (at most MAX_TRIES)
+#    "csv": true}                    include the room files in the answer
+#
+# Each round of the incumbent is re-optimized with KL from where it was, with
+# the constrained reviewers pinned, and the papers are re-balanced with the
+# flow balancer, keeping them in their old rooms where it can. The answer
+# gives the new room sizes and plenary, which people and papers moved, and
+# the new contents of people-rooms.csv and paper-rooms.csv.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+ILS_FRACTION = 0.05 # of each room, swapped for every try after the first
+MAX_TRIES = 20 # each try re-optimizes every round, so a what-if stays quick
+
+def new_constraints():
+    return {'pin': {}, 'forbid': {}, 'papers': {}, 'plenary': []}
+
+# Checks that the fields of a what-if have the right JSON types: rooms, people
+# and papers are strings, and forbid takes a room or a list of them. Raises
+# ValueError if not.
+def check_request_types(request):
+    def check(ok, key, kind):
+        if not ok:
+            raise ValueError(f'{key!r} must be {kind}')
+    def is_strings(values):
+        return isinstance(values, list) and all(isinstance(value, str) for value in values)
+    for key in ['pin', 'papers']:
+        value = request.get(key, {})
+        check(isinstance(value, dict) and all(isinstance(room, str) for room in value.values()), key,
+              'an object of rooms')
+    forbid = request.get('forbid', {})
+    check(isinstance(forbid, dict) and all(isinstance(rooms, str) or is_strings(rooms) for rooms in forbid.values()),
+          'forbid', 'an object of rooms or lists of rooms')
+    check(is_strings(request.get('plenary', [])), 'plenary', 'a list of papers')
+    tries = request.get('tries', 1)
+    check(type(tries) is int and 1 <= tries <= MAX_TRIES, 'tries', f'a whole number from 1 to {MAX_TRIES}')
+    seed = request.get('seed')
+    check(seed is None or type(seed) is int, 'seed', 'a whole number')
+    for key in ['csv', 'keep']:
+        check(type(request.get(key, False)) is bool, key, 'true or false')
+
+# Checks a what-if's constraints and returns them in the form of
+# new_constraints, added to those in base. Raises ValueError if they are bad.
+def merge_constraints(session, base, request):
+    check_request_types(request)
+    constraints = {'pin': dict(base['pin']), 'forbid': {r: list(rooms) for r, rooms in base['forbid'].items()},
+                   'papers': dict(base['papers']), 'plenary': list(base['plenary'])}
+    room_labels = get_room_labels(2 * session['rounds'])
+    def check_room(room):
+        if room not in room_labels:
+            raise ValueError(f'unknown room {room!r} (rooms are {",".join(room_labels)})')
+    for rev, room in request.get('pin', {}).items():
+        check_room(room)
+        constraints['pin'][rev] = room
+    for rev, rooms in request.get('forbid', {}).items():
+        for room in [rooms] if isinstance(rooms, str) else rooms:
+            check_room(room)
+            if room not in constraints['forbid'].setdefault(rev, []):
+                constraints['forbid'][rev].append(room)
+    for pid, room in request.get('papers', {}).items():
+        check_room(room)
+        constraints['papers'][pid] = room
+    for pid in request.get('plenary', []):
+        if pid not in constraints['plenary']:
+            constraints['plenary'].append(pid)
+    for pid in list(constraints['papers']) + constraints['plenary']:
+        if pid not in session['papers']:
+            raise ValueError(f'unknown paper {pid} (or one with a single reviewer)')
+    for rev in list(constraints['pin']) + list(constraints['forbid']):
+        if rev not in session['graph']['index']:
+            raise ValueError(f'unknown reviewer {rev}')
+    return constraints
+
+# Round and side (0 or 1) of a room label, e.g. 'Y' is (1, 1).
+def get_room_round(room):
+    for k, pair in enumerate(ROUND_ROOM_LABELS):
+        if room in pair:
+            return k, pair.index(room)
+
+# The side every constrained reviewer must be on, in each round: a list with a
+# {reviewer: side} dict per round. Pinning a paper to a room pins both its
+# reviewers there. Raises ValueError if two constraints disagree.
+def get_reviewer_pins(session, constraints):
+    pins = [{} for k in range(session['rounds'])]
+    def pin(rev, room, forbid=False):
+        k, side = get_room_round(room)
+        if forbid:
+            side = 1 - side
+        if pins[k].setdefault(rev, side) != side:
+            raise ValueError(f'reviewer {rev} cannot be in both rooms {ROUND_ROOM_LABELS[k]}')
+    for rev, room in constraints['pin'].items():
+        pin(rev, room)
+    for rev, rooms in constraints['forbid'].items():
+        for room in rooms:
+            pin(rev, room, forbid=True)
+    for pid, room in constraints['papers'].items():
+        for rev in session['papers'][pid]:
+            pin(rev, room)
+    return pins
+
+# Papers whose rooms are fixed by the constraints: pid to the tuple of rooms
+# it may go to, as in classify_papers_rounds (so plenary is the empty tuple).
+def get_paper_pins(session, constraints):
+    room_numbers = {label: i for i, label in enumerate(get_room_labels(2 * session['rounds']))}
+    paper_pins = {pid: (room_numbers[room],) for pid, room in constraints['papers'].items()}
+    paper_pins.update(dict.fromkeys(constraints['plenary'], ()))
+    return paper_pins
+
+# Reviewers not in a later round's subgraph keep their side from the incumbent
+# (or the side they are pinned to), so that their rooms do not change needlessly.
+def place_reviewers_missing_from_round(reviewers, partition, previous, round_pins):
+    room0, room1, cut = partition
+    in_rooms = set(room0) | set(room1)
+    previous_side = make_room_index(previous)
+    for rev in reviewers:
+        if rev in in_rooms:
+            continue
+        side = round_pins.get(rev, previous_side.get(rev))
+        if side is None:
+            side = 0 if len(room0) <= len(room1) else 1
+        (room0, room1)[side].append(rev)
+
+# Re-optimizes each round of reviewer_rooms (A,B,X,Y...) in turn, from the
+# incumbent's split of that round (perturbed, if rng is given), with the
+# reviewers in pins fixed and moves away from the incumbent penalized, so the
+# rooms keep their labels. Returns the new partitions.
+def repartition_rounds(session, reviewer_rooms, pins, rng=None):
+    graph = session['graph']
+    index = graph['index']
+    partitions = []
+    subgraph = graph
+    for k, round_pins in enumerate(pins):
+        if k:
+            subgraph = make_subgraph_from_cut(subgraph, partitions[-1])
+        previous = (reviewer_rooms[2*k], reviewer_rooms[2*k + 1], [])
+        anchor = ({index[r] for r in previous[0] if r in index}, {index[r] for r in previous[1] if r in index})
+        initial = perturb_split(subgraph, previous, ILS_FRACTION, rng) if rng else anchor
+        partition = repartition_graph(subgraph, initial, {index[r]: side for r, side in round_pins.items()}, anchor)
+        if k:
+            place_reviewers_missing_from_round(session['reviewers'], partition, previous, round_pins)
+        partitions.append(partition)
+    return partitions
+
+# Balances the papers over the rooms of partitions, as the R-round engine does,
+# but with the pinned papers in just their rooms (or plenary). Returns
+# paper_rooms, the pids in plenary and the excess over the room cap.
+def assign_constrained_papers(session, partitions, paper_pins, previous_rooms):
+    pid_groups = classify_papers_rounds(session['papers'], partitions)
+    if paper_pins:
+        regrouped = {}
+        for rooms, pids in pid_groups.items():
+            for pid in pids:
+                regrouped.setdefault(paper_pins.get(pid, rooms), []).append(pid)
+        pid_groups = regrouped
+    n_rooms = 2 * len(partitions)
+    paper_rooms = flow_assign_groups_to_rooms(pid_groups, n_rooms, previous_rooms)
+    excess = max(0, max(len(room) for room in paper_rooms) - get_assignable_room_size(pid_groups, n_rooms))
+    return paper_rooms, pid_groups.get((), []), excess
+
+# A complete answer: the rooms, with singles added, and each person's rooms
+# and each paper's room (P for plenary) for the CSV files and the deltas.
+def make_solution(session, reviewer_rooms, paper_rooms, pids_in_cut, excess=0):
+    paper_rooms = [list(room) for room in paper_rooms] # singles are added to a copy
+    rooms_by_person, summary = complete_room_assignments(session['reviewers'], session['papers'], session['singles'],
+                                                         reviewer_rooms, paper_rooms, pids_in_cut)
+    room_by_paper = dict.fromkeys(pids_in_cut, PLENARY)
+    for label, room in zip(get_room_labels(len(paper_rooms)), paper_rooms):
+        room_by_paper.update(dict.fromkeys(room, label))
+    return {
+        'reviewer_rooms': reviewer_rooms,
+        'paper_rooms': paper_rooms,
+        'pids_in_cut': pids_in_cut,
+        'excess': excess,
+        'valid': summary['ok'],
+        'rooms_by_person': rooms_by_person,
+        'room_by_paper': room_by_paper,
+    }
+
+def get_previous_rooms(session, solution):
+    room_numbers = {label: i for i, label in enumerate(get_room_labels(2 * session['rounds']))}
+    return {pid: room_numbers[room] for pid, room in solution['room_by_paper'].items() if room in room_numbers}
+
+# Answers a what-if: the best (fewest papers in plenary, then least excess)
+# of tries re-optimizations of the incumbent under the constraints.
+def solve_what_if(session, constraints, tries=1, seed=None):
+    incumbent = session['incumbent']
+    pins = get_reviewer_pins(session, constraints)
+    paper_pins = get_paper_pins(session, constraints)
+    previous_rooms = get_previous_rooms(session, incumbent)
+    rng = random.Random(seed)
+    best = None
+    for t in range(max(1, tries)):
+        partitions = repartition_rounds(session, incumbent['reviewer_rooms'], pins, rng if t else None)
+        paper_rooms, pids_in_cut, excess = assign_constrained_papers(session, partitions, paper_pins, previous_rooms)
+        key = (len(pids_in_cut), excess)
+        if best is None or key < best[0]:
+            reviewer_rooms = [room for partition in partitions for room in partition[:2]]
+            best = (key, reviewer_rooms, paper_rooms, pids_in_cut, excess)
+    key, reviewer_rooms, paper_rooms, pids_in_cut, excess = best
+    return make_solution(session, reviewer_rooms, paper_rooms, pids_in_cut, excess)
+
+def get_deltas(old, new):
+    people = {p: [old.get(p), rooms] for p, rooms in new.items() if old.get(p) != rooms}
+    people.update({p: [rooms, None] for p, rooms in old.items() if p not in new})
+    return people
+
+def summarize_solution(solution):
+    return {
+        'plenary': len(solution['pids_in_cut']),
+        'room_sizes': [len(room) for room in solution['paper_rooms']],
+        'excess': solution['excess'],
+        'valid': solution['valid'],
+    }
+
+def handle_what_if(session, request):
+    start = time.perf_counter()
+    constraints = merge_constraints(session, session['constraints'], request)
+    solution = solve_what_if(session, constraints, request.get('tries', 1), request.get('seed'))
+    incumbent = session['incumbent']
+    answer = summarize_solution(solution)
+    answer['constraints'] = constraints
+    answer['moved_people'] = get_deltas(incumbent['rooms_by_person'], solution['rooms_by_person'])
+    answer['moved_papers'] = get_deltas(incumbent['room_by_paper'], solution['room_by_paper'])
+    if request.get('csv', True):
+        answer['people_csv'] = format_people_rooms(solution['rooms_by_person'])
+        answer['paper_csv'] = format_paper_rooms(solution['paper_rooms'], solution['pids_in_cut'])
+    if request.get('keep'):
+        session['incumbent'] = solution
+        session['constraints'] = constraints
+    answer['kept'] = bool(request.get('keep'))
+    answer['seconds'] = round(time.perf_counter() - start, 4)
+    return answer
+
+def get_status(session):
+    status = summarize_solution(session['incumbent'])
+    status.update({
+        'fname': session['fname'],
+        'reviewers': len(session['reviewers']),
+        'papers': len(session['papers']),
+        'singles': len(session['singles']),
+        'rounds': session['rounds'],
+        'constraints': session['constraints'],
+    })
+    return status
+
+def reset_session(session):
+    session['incumbent'] = session['initial']
+    session['constraints'] = new_constraints()
+    return get_status(session)
+
+# Reviewer rooms (A,B,X,Y...) and paper rooms from people-rooms.csv and
+# paper-rooms.csv files, as an incumbent to start from.
+def read_previous_solution(session, people_file, papers_file):
+    people_rooms = read_rooms_file(people_file)
+    session['rounds'] = get_person_rounds(people_rooms)
+    reviewer_rooms = [ [] for i in range(2 * session['rounds']) ]
+    for person, rooms in people_rooms.items():
+        for k, room in enumerate(rooms[:session['rounds']]):
+            if room in ROUND_ROOM_LABELS[k]: # else a bad row, so left for KL to place
+                reviewer_rooms[2*k + ROUND_ROOM_LABELS[k].index(room)].append(person)
+    room_by_paper = read_rooms_file(papers_file) if papers_file else {}
+    return {'reviewer_rooms': reviewer_rooms, 'room_by_paper': room_by_paper, 'rooms_by_person': people_rooms}
+
+def make_session(args):
+    logger.info(f'Reading {args.fname} ...')
+    reviewers, papers, singles = read_assignments(args.fname, args.third)
+    logger.info(f'Input reviewers and papers: {len(reviewers)} {len(papers)}')
+    graph = make_graph_from_paper_reviews(reviewers, papers)
+    get_csr_graph(graph) # every what-if refines on it
+    session = {
+        'fname': args.fname,
+        'reviewers': reviewers,
+        'papers': papers,
+        'singles': singles,
+        'graph': graph,
+        'rounds': args.rounds,
+        'constraints': new_constraints(),
+    }
+    if args.previous_people:
+        logger.info(f'Starting from {args.previous_people} ...')
+        session['incumbent'] = read_previous_solution(session, args.previous_people, args.previous_papers)
+        session['incumbent'] = solve_what_if(session, session['constraints'])
+    else:
+        logger.info(f'Running {args.ntrials} trials (seed {args.seed}) for the first rooms ...')
+        options = get_trial_options({'engine': args.engine, 'rounds': args.rounds, 'max_excess': args.max_excess,
+                                     'load_balance': args.load_balance})
+        rooms = assign_rooms(graph, reviewers, papers, args.ntrials, args.seed, workers=args.workers, options=options)
+        if not rooms:
+            halt_with_error('partition failed! (try a larger --max-excess)')
+        session['incumbent'] = make_solution(session, *rooms)
+    session['initial'] = session['incumbent']
+    status = get_status(session)
+    logger.info(f'Incumbent: {status["plenary"]} papers in plenary, room sizes {status["room_sizes"]}')
+    return session
+
+class WhatIfHandler(BaseHTTPRequestHandler):
+    def send_body(self, code, body, content_type):
+        data = body.encode()
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, code, answer):
+        self.send_body(code, json.dumps(answer) + '\n', 'application/json')
+
+    def do_GET(self):
+        session = self.server.session
+        path = urlparse(self.path).path
+        incumbent = session['incumbent']
+        if path == '/status':
+            self.send_json(200, get_status(session))
+        elif path == '/people-rooms.csv':
+            self.send_body(200, format_people_rooms(incumbent['rooms_by_person']), 'text/csv')
+        elif path == '/paper-rooms.csv':
+            self.send_body(200, format_paper_rooms(incumbent['paper_rooms'], incumbent['pids_in_cut']), 'text/csv')
+        else:
+            self.send_json(404, {'error': f'no such page {path}'})
+
+    def do_POST(self):
+        session = self.server.session
+        path = urlparse(self.path).path
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError('expected a JSON object')
+            if path == '/whatif':
+                self.send_json(200, handle_what_if(session, request))
+            elif path == '/reset':
+                self.send_json(200, reset_session(session))
+            else:
+                self.send_json(404, {'error': f'no such page {path}'})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception: # a bug, not a bad request: answer, then let the server log the traceback
+            self.send_json(500, {'error': 'internal error (see the server log)'})
+            raise
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'unix'
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    pass
+
+# Requests are handled one at a time, so a what-if that keeps its answer never
+# races another.
+def serve(session, args):
+    if args.socket:
+        server = UnixHTTPServer(args.socket, WhatIfHandler)
+        logger.info(f'Serving what-ifs on {args.socket}')
+    else:
+        server = HTTPServer((args.host, args.port), WhatIfHandler)
+        logger.info(f'Serving what-ifs on http://{args.host}:{args.port}/')
+    server.session = session
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket:
+            os.unlink(args.socket)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Serve what-if questions on SIGGRAPH PC room assignments.')
+    parser.add_argument('fname', nargs='?', default='fake-data.csv', help='input CSV file (default fake-data.csv)')
+    parser.add_argument('ntrials', nargs='?', type=int, default=1000, help='trials for the first rooms (default 1000)')
+    parser.add_argument('--seed', type=int, help='base seed for the first trials (default random)')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for the first trials (0 = one per core, default 1)')
+    parser.add_argument('--engine', choices=list(PARTITION_ENGINES), default='csr', help='graph bisection engine for the first trials (default csr)')
+    parser.add_argument('--load-balance', type=float, nargs='?', const=LOAD_BALANCE_TOLERANCE, metavar='TOLERANCE',
+                        help='balance the paper loads of each bisection in the first trials (0.01 if no TOLERANCE; '
+                             'default on for one round)')
+    parser.add_argument('--third', action='store_true', help='keep the Second Secondary reviewer of a paper in its room too')
+    parser.add_argument('--rounds', type=int, default=2, choices=range(1, MAX_ROUNDS + 1), metavar='R',
+                        help=f'rounds of bisection, for 2R rooms (1 to {MAX_ROUNDS}, default 2)')
+    parser.add_argument('--max-excess', type=int, default=0, help='papers a room may hold beyond the cap in the first trials (default 0)')
+    parser.add_argument('--previous-people', metavar='FILE', help='start from these people rooms instead of running trials')
+    parser.add_argument('--previous-papers', metavar='FILE', help='and keep papers in these rooms where possible')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'port to listen on (default {DEFAULT_PORT})')
+    parser.add_argument('--socket', metavar='PATH', help='listen on this Unix socket instead of a port')
+    args = parser.parse_args()
+    if args.previous_papers and not args.previous_people:
+        parser.error('--previous-papers needs --previous-people')
+    if args.seed is None:
+        args.seed = random.randrange(MAX_SEED)
+    return args
+
+def main():
+    args = parse_args()
+    setup_logging()
+    session = exit_on_rooms_error(make_session, args)
+    serve(session, args)
@@ -0,0 +1,195 @@
+import sys
+import itertools
+from collections import Counter
+
+# Verifier engine for room assignments, shared by verify-room-assignments.py
+# and assign-pc-rooms.py (--verify), which calls it in-process on its results.
+#
+# Rooms are encoded as bitmasks (A,B,X,Y = 1,2,4,8, plenary = 0), so each person
+# is the OR of their two rooms, and the rooms all reviewers of a paper share are
+# the AND of theirs. A paper is then checked with a couple of integer tests, and
+# all papers are checked in one pass: with NumPy, if it is installed, as array
+# operations over every paper at once, and then only the papers with a problem
+# are looked at one by one to describe it. Every violation is collected, rather
+# than stopping at the first one.
+#
+# With R rounds (assign-pc-rooms.py --rounds R) each person has one room of
+# each of the first R pairs in ROUND_ROOM_LABELS, e.g. 'AXU' for three rounds,
+# and the later pairs get the next bits.
+
+PLENARY = 'P'
+ROUND_ROOM_LABELS = ['AB', 'XY', 'UV', 'ST', 'MN', 'JK']
+ROOM_BITS = {label: 1 << i for i, label in enumerate(''.join(ROUND_ROOM_LABELS))}
+PAPER_ROOM_BITS = dict(ROOM_BITS, P=0)
+
+# Violation categories, in the order they are reported.
+VIOLATIONS = [
+    'bad_paper_room',       # paper not assigned to exactly one legal room
+    'bad_person_room',      # person not assigned to a legal pair of rooms
+    'missing_person',       # reviewer of a paper with no room assignment
+    'unknown_paper',        # paper room given for a paper not in the data
+    'reviewer_not_in_room', # paper in a room that one of its reviewers is not in
+    'avoidable_plenary',    # paper in plenary although its reviewers share a room
+]
+
+# True if mask has exactly one room of each of the first rounds pairs, and no
+# other rooms (for two rounds: AX, BX, AY or BY).
+def is_legal_person_mask(mask, rounds=2):
+    for k in range(rounds):
+        if (mask >> 2*k) & 3 not in (1, 2):
+            return False
+    return mask >> 2*rounds == 0
+
+# Room string (e.g. 'AX') to bitmask, or None if it is not a legal person room.
+def encode_person_room(room, rounds=2):
+    mask = 0
+    for r in room:
+        if r not in ROOM_BITS or mask & ROOM_BITS[r]:
+            return None
+        mask |= ROOM_BITS[r]
+    return mask if is_legal_person_mask(mask, rounds) else None
+
+# The number of rounds of a set of person rooms: the most common room string
+# length (so a few bad rows do not change it), or 2 if there are none.
+def get_person_rounds(people_rooms):
+    lengths = Counter(len(room) for room in people_rooms.values())
+    return lengths.most_common(1)[0][0] if lengths else 2
+
+def encode_paper_room(room):
+    if len(room) != 1:
+        return None
+    return PAPER_ROOM_BITS.get(room)
+
+# Bitmask of a paper room in the first rounds (0 for plenary), or None.
+def get_paper_mask(room, rounds=2):
+    mask = encode_paper_room(room)
+    return None if mask is None or mask >> 2*rounds else mask
+
+# Checks one paper against the rooms of its reviewers, adding its violations
+# (and those of reviewers with no room, the first time they are seen). Returns
+# True if the paper is in plenary and its reviewers all have legal rooms.
+def check_paper(pid, revs, paper_mask, person_masks, rounds, missing, violations, paper_rooms, people_rooms):
+    if paper_mask is None:
+        return False # already reported
+    shared = (1 << 2*rounds) - 1
+    for rev in revs:
+        mask = person_masks.get(rev)
+        if mask is None:
+            if rev not in person_masks and rev not in missing:
+                missing.add(rev)
+                violations.append(('missing_person', rev, f'no room assignment for person {rev}'))
+            return False
+        shared &= mask
+    if paper_mask == 0:
+        if shared:
+            violations.append(('avoidable_plenary', pid, f'paper {pid} is in Plenary but its reviewers '
+                               f'{",".join(revs)} share a room ({",".join(people_rooms[r] for r in revs)})'))
+        return True
+    if not shared & paper_mask:
+        violations.append(('reviewer_not_in_room', pid, f'paper {pid} is in room {paper_rooms[pid]} but its reviewers '
+                           f'{",".join(revs)} are in {",".join(people_rooms[r] for r in revs)}'))
+    return False
+
+# The same checks as check_paper, as array operations over all papers at once.
+# Returns the number of papers in plenary, the pids of the papers that may
+# have a violation (in input order), for check_paper to describe, and the
+# number of papers that have a room in paper_rooms.
+def numpy_screen_papers(numpy, papers, paper_rooms, person_masks, rounds):
+    codes = {person: -2 if mask is None else mask for person, mask in person_masks.items()} # -2: illegal rooms
+    masks = numpy.array(list(map(codes.get, itertools.chain.from_iterable(papers.values()), itertools.repeat(-1))),
+                        dtype=numpy.int64) # -1: no room assignment
+    lengths = numpy.fromiter(map(len, papers.values()), dtype=numpy.int64, count=len(papers))
+    pids = list(papers)
+    rooms = list(map(paper_rooms.get, pids))
+    n_known = len(rooms) - rooms.count(None)
+    # encode_paper_room for every paper (its keys are the single letters), -1 if illegal
+    room_bits = dict(PAPER_ROOM_BITS)
+    room_bits[None] = 0 # no room is plenary
+    paper_mask = numpy.array(list(map(room_bits.get, rooms, itertools.repeat(-1))), dtype=numpy.int64)
+    paper_mask[paper_mask >= 1 << 2*rounds] = -1 # a room of a later round
+    all_rooms = (1 << 2*rounds) - 1
+    masks = numpy.append(masks, all_rooms) # so papers with no reviewers at the end have a valid start
+    starts = numpy.cumsum(lengths) - lengths
+    # reduceat gives the single element at start for papers with no reviewers,
+    # whose reviewers share every room, as in check_paper
+    empty = lengths == 0
+    unknown = (numpy.minimum.reduceat(masks, starts) < 0) & ~empty # a reviewer has no legal room
+    shared = numpy.where(empty, all_rooms, numpy.bitwise_and.reduceat(numpy.maximum(masks, 0), starts) & all_rooms)
+    checked = (paper_mask >= 0) & ~unknown
+    plenary = checked & (paper_mask == 0)
+    wrong_room = checked & (paper_mask > 0) & (shared & paper_mask == 0)
+    flagged = ((paper_mask >= 0) & unknown) | (plenary & (shared != 0)) | wrong_room
+    return int(numpy.count_nonzero(plenary)), [pids[i] for i in numpy.flatnonzero(flagged)], n_known
+
+# papers maps each pid to a tuple of its reviewers (one or more), paper_rooms
+# maps pids to a room letter (papers not in it are in plenary), and
+# people_rooms maps people to their two room letters, e.g. 'AX' (or one per
+# round, if rounds is given or found by get_person_rounds). Returns a report
+# with counts and the violations, a list of (category, item, message).
+def verify_room_assignments(papers, paper_rooms, people_rooms, rounds=None):
+    if rounds is None:
+        rounds = get_person_rounds(people_rooms)
+    violations = []
+    person_masks = {}
+    for person, room in people_rooms.items():
+        mask = encode_person_room(room, rounds)
+        if mask is None:
+            violations.append(('bad_person_room', person, f'person {person} assigned to illegal rooms: {room}'))
+        person_masks[person] = mask
+    missing = set()
+    paper_violations = []
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy and papers:
+        n_plenary, flagged, n_known = numpy_screen_papers(numpy, papers, paper_rooms, person_masks, rounds)
+    else:
+        n_plenary, flagged, n_known = None, papers, sum(map(paper_rooms.__contains__, papers))
+    in_plenary = [check_paper(pid, papers[pid], get_paper_mask(paper_rooms.get(pid, PLENARY), rounds), person_masks,
+                              rounds, missing, paper_violations, paper_rooms, people_rooms) for pid in flagged]
+    if n_plenary is None:
+        n_plenary = sum(in_plenary)
+    limit = 1 << 2*rounds # the first bit of a later round (or of an illegal room, below)
+    bad_pids = {pid for pid, mask in zip(paper_rooms, map(PAPER_ROOM_BITS.get, paper_rooms.values(),
+                                                          itertools.repeat(limit))) if mask >= limit}
+    for pid, room in paper_rooms.items() if bad_pids or n_known < len(paper_rooms) else []:
+        if pid in bad_pids:
+            violations.append(('bad_paper_room', pid, f'paper {pid} not assigned to exactly one legal room: {room}'))
+        elif pid not in papers:
+            violations.append(('unknown_paper', pid, f'paper {pid} has a room but is not in the data'))
+    violations += paper_violations
+    counts = dict.fromkeys(VIOLATIONS, 0)
+    for category, item, msg in violations:
+        counts[category] += 1
+    order = {category: i for i, category in enumerate(VIOLATIONS)}
+    violations.sort(key=lambda v: order[v[0]]) # stable, so input order within a category
+    return {
+        'ok': not violations,
+        'rounds': rounds,
+        'papers': len(papers),
+        'plenary': n_plenary,
+        'counts': counts,
+        'violations': violations,
+    }
+
+def print_verify_report(report, max_per_category=None):
+    shown = dict.fromkeys(VIOLATIONS, 0)
+    for category, item, msg in report['violations']:
+        shown[category] += 1
+        if max_per_category is None or shown[category] <= max_per_category:
+            print(f'Error ({category}): {msg}')
+    if max_per_category is not None:
+        for category in VIOLATIONS:
+            if shown[category] > max_per_category:
+                print(f'-- ... and {shown[category] - max_per_category} more {category} errors')
+    if report['plenary']:
+        print(f'There are {report["plenary"]} papers in Plenary.')
+    if not report['ok']:
+        counts = ', '.join(f'{category} {n}' for category, n in report['counts'].items() if n)
+        print(f'FAILED: {len(report["violations"])} violations ({counts}).')
+
+# Exits with status 1 if the report has any violations.
+def exit_on_violations(report):
+    if not report['ok']:
+        sys.exit(1)
@@ -0,0 +1,27 @@
+import os
+import sys
+import random
+import pytest
+
+# The modules live at the top of the repo, next to the scripts.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Fake input like gen-fake-data.py's: reviewers in clusters, and most papers
+# have both reviewers from one cluster. Tests get the builder as the
+# clustered_rows fixture and pass their own sizes.
+def make_clustered_rows(n_reviewers=80, n_papers=600, n_clusters=4, affinity=0.8, seed=3):
+    rng = random.Random(seed)
+    reviewers = [f'r{i}' for i in range(n_reviewers)]
+    clusters = [reviewers[c::n_clusters] for c in range(n_clusters)]
+    rows = []
+    for i in range(n_papers):
+        cluster = rng.choice(clusters)
+        first = rng.choice(cluster)
+        second = rng.choice(cluster if rng.random() < affinity else reviewers)
+        if second != first:
+            rows.append((f'p{i}', False, [first, second]))
+    return rows
+
+@pytest.fixture
+def clustered_rows():
+    return make_clustered_rows
@@ -0,0 +1,14 @@
+import pc_rooms
+
+# A paper in more than one row keeps its last row, whatever that row says.
+
+def test_last_duplicate_row_wins():
+    rows = [('p1', False, ['r1', 'r2']), ('p2', False, ['r1', 'r3']), ('p3', False, ['r2', 'r3']),
+            ('p1', False, ['r2', 'r3']), ('p2', True, ['r1', 'r3']), ('p3', False, ['r3'])]
+    reviewers, papers, singles = pc_rooms.make_assignments(rows)
+    assert papers == {'p1': ('r2', 'r3')}
+    assert singles == {'p3': 'r3'}
+
+def test_withdrawn_then_listed_again_is_kept():
+    reviewers, papers, singles = pc_rooms.make_assignments([('p1', True, ['r1', 'r2']), ('p1', False, ['r1', 'r2'])])
+    assert papers == {'p1': ('r1', 'r2')}
@@ -0,0 +1,61 @@
+import random
+import itertools
+import pytest
+import pc_rooms
+
+# The nine categories of the two-round engine as groups of room numbers:
+# AX, BX, AY, BY, then CX, CY, AZ, BZ (one room only), then CZ (plenary).
+CATEGORY_GROUPS = [(0, 2), (1, 2), (0, 3), (1, 3), (2,), (3,), (0,), (1,), ()]
+
+def make_pid_lists(sizes):
+    return [[f'p{i}-{j}' for j in range(size)] for i, size in enumerate(sizes)]
+
+def random_sizes(rng, max_size):
+    return [rng.randint(0, max_size) for i in range(9)]
+
+# Smallest fullest room over every split of the four flexible categories.
+def brute_force_min_max_room(pid_lists):
+    sizes = [len(pids) for pids in pid_lists]
+    best = None
+    for counts in itertools.product(*[range(sizes[i] + 1) for i in range(4)]):
+        rooms = [sizes[6], sizes[7], sizes[4], sizes[5]] # A, B, X, Y
+        for i, count in enumerate(counts):
+            neg, pos = pc_rooms.get_neg_and_pos(i)
+            rooms[neg] += count
+            rooms[pos] += sizes[i] - count
+        best = max(rooms) if best is None else min(best, max(rooms))
+    return best
+
+def test_flow_matches_brute_force():
+    rng = random.Random(1)
+    for case in range(300):
+        pid_lists = make_pid_lists(random_sizes(rng, 6))
+        paper_rooms = pc_rooms.flow_assign_pids_to_rooms(pid_lists)
+        assert max(len(room) for room in paper_rooms) == brute_force_min_max_room(pid_lists)
+
+def test_flow_agrees_with_sat():
+    pytest.importorskip('pysat')
+    rng = random.Random(2)
+    for case in range(200):
+        pid_lists = make_pid_lists(random_sizes(rng, 12))
+        flow_ok = pc_rooms.get_room_excess(pid_lists, pc_rooms.flow_assign_pids_to_rooms(pid_lists)) <= 0
+        sat_ok = pc_rooms.sat_assign_pids_to_rooms(pid_lists) is not None
+        assert flow_ok == sat_ok, [len(pids) for pids in pid_lists]
+
+def test_group_flow_agrees_with_sat():
+    pytest.importorskip('pysat')
+    rng = random.Random(3)
+    for case in range(200):
+        pid_lists = make_pid_lists(random_sizes(rng, 12))
+        pid_groups = dict(zip(CATEGORY_GROUPS, pid_lists))
+        paper_rooms = pc_rooms.flow_assign_groups_to_rooms(pid_groups, 4)
+        flow_ok = max(len(room) for room in paper_rooms) <= pc_rooms.get_assignable_room_size(pid_groups, 4)
+        sat_ok = pc_rooms.sat_assign_pids_to_rooms(pid_lists) is not None
+        assert flow_ok == sat_ok, [len(pids) for pids in pid_lists]
+        assert sorted(pid for room in paper_rooms for pid in room) == sorted(pid for pids in pid_lists[:8] for pid in pids)
+
+def test_check_balancer_raises_on_disagreement(monkeypatch):
+    pid_lists = make_pid_lists([4, 4, 4, 4, 1, 1, 1, 1, 0])
+    monkeypatch.setattr(pc_rooms, 'sat_assign_pids_to_rooms', lambda pid_lists: None)
+    with pytest.raises(pc_rooms.InvariantError):
+        pc_rooms.check_assign_pids_to_rooms(pid_lists)
@@ -0,0 +1,50 @@
+import random
+import pc_rooms
+
+# The indexed classifier must give the same pid_lists as the list-membership
+# classifier it replaced, reimplemented here from the original script, and
+# get_room must read the same room from the index as membership did.
+
+def classify_papers_ABC(papers, partition):
+    roomA, roomB, cutC = partition
+    pidsABC = [ [] for i in range(3) ]
+    for pid in papers:
+        pri,sec = papers[pid]
+        if pri in roomA and sec in roomA:
+            pidsABC[0].append(pid)
+        elif pri in roomB and sec in roomB:
+            pidsABC[1].append(pid)
+        else:
+            pidsABC[2].append(pid)
+    return pidsABC
+
+def baseline_classify_papers_ABCXYZ(papers, partition1, partition2):
+    pidsABCXYZ = classify_papers_ABC(papers, partition1) + classify_papers_ABC(papers, partition2)
+    pid_lists = [ [] for i in range(9) ]
+    for pid in papers:
+        inABCXYZ = [ (pid in pidsABCXYZ[i]) for i in range(6) ]
+        for index, room0, room1 in pc_rooms.LIST_ABCXYZ:
+            if inABCXYZ[room0] and inABCXYZ[room1]:
+                pid_lists[index].append(pid)
+                break
+    return pid_lists
+
+# Random rooms, leaving some reviewers out of the second round as its
+# subgraph does.
+def make_random_partition(reviewers, rng, left_out=0.0):
+    room0, room1 = [], []
+    for rev in reviewers:
+        if rng.random() >= left_out:
+            (room0 if rng.random() < 0.5 else room1).append(rev)
+    return room0, room1, []
+
+def test_indexed_classifier_matches_baseline(clustered_rows):
+    reviewers, papers, singles = pc_rooms.make_assignments(clustered_rows(n_papers=400))
+    for seed in range(5):
+        rng = random.Random(seed)
+        partition1 = make_random_partition(reviewers, rng)
+        partition2 = make_random_partition(reviewers, rng, left_out=0.3)
+        assert (pc_rooms.classify_papers_ABCXYZ(papers, partition1, partition2) ==
+                baseline_classify_papers_ABCXYZ(papers, partition1, partition2)), seed
+        room_index = pc_rooms.make_room_index(partition1)
+        assert all(pc_rooms.get_room(rev, room_index) == (0 if rev in partition1[0] else 1) for rev in reviewers)
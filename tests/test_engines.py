@@ -0,0 +1,26 @@
+import random
+import pytest
+import pc_rooms
+
+# The CSR engine must find cuts as good as the networkx engine it replaced:
+# over the same seeds on a small fixed graph, its mean cut cost may be at most
+# TOLERANCE worse (the two break ties differently, so they need not match seed
+# for seed).
+SEEDS = 30
+TOLERANCE = 0.03
+
+def make_graph(rows):
+    reviewers, papers, singles = pc_rooms.make_assignments(rows)
+    return pc_rooms.make_graph_from_paper_reviews(reviewers, papers)
+
+def get_mean_cut_cost(graph, engine):
+    costs = [pc_rooms.partition_cut_cost(graph, pc_rooms.partition_graph(graph, random.Random(seed), engine))
+             for seed in range(SEEDS)]
+    return sum(costs) / len(costs)
+
+def test_csr_cuts_match_networkx(clustered_rows):
+    pytest.importorskip('networkx')
+    graph = make_graph(clustered_rows(n_reviewers=100, n_papers=1000, affinity=0.7))
+    csr = get_mean_cut_cost(graph, 'csr')
+    nx = get_mean_cut_cost(graph, 'networkx')
+    assert csr <= nx * (1 + TOLERANCE), (csr, nx)
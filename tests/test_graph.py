@@ -0,0 +1,23 @@
+import pc_rooms
+
+# Paper loads of a view: a paper counts only if all its reviewers, the third
+# one included, are in the view.
+
+def make_graph(rows):
+    reviewers, papers, singles = pc_rooms.make_assignments(rows, third=True)
+    return pc_rooms.make_graph_from_paper_reviews(reviewers, papers)
+
+def get_view_loads(graph, names):
+    nodes = [graph['index'][name] for name in names]
+    edges = [e for e in range(len(graph['src']))
+             if {graph['src'][e], graph['dst'][e], graph['third'][e]} - {-1} <= set(nodes)]
+    view = pc_rooms.make_graph_view(graph, nodes, edges)
+    loads = pc_rooms.get_csr_loads(view)
+    csr_nodes = pc_rooms.get_csr_graph(view)[0]
+    return {graph['reviewers'][r]: load for r, load in zip(csr_nodes, loads)}
+
+def test_loads_skip_papers_with_third_outside_view():
+    graph = make_graph([('p1', False, ['r1', 'r2', 'r3']), ('p2', False, ['r1', 'r2']),
+                        ('p3', False, ['r2', 'r4'])])
+    assert get_view_loads(graph, ['r1', 'r2', 'r4']) == {'r1': 1, 'r2': 2, 'r4': 1}
+    assert get_view_loads(graph, ['r1', 'r2', 'r3']) == {'r1': 2, 'r2': 2, 'r3': 1}
@@ -0,0 +1,32 @@
+import pytest
+import pc_rooms
+import pc_service
+from pc_verify import ROUND_ROOM_LABELS
+
+def make_session(rows):
+    reviewers, papers, singles = pc_rooms.make_assignments(rows)
+    graph = pc_rooms.make_graph_from_paper_reviews(reviewers, papers)
+    session = {'reviewers': reviewers, 'papers': papers, 'singles': singles, 'graph': graph, 'rounds': 2,
+               'constraints': pc_service.new_constraints()}
+    rooms = pc_rooms.assign_rooms(graph, reviewers, papers, 20, seed=1, options={'max_excess': 50})
+    session['incumbent'] = session['initial'] = pc_service.make_solution(session, *rooms)
+    return session
+
+# Pinning a reviewer to the other room of a round must not swap the round's
+# rooms for everyone else.
+def test_single_pin_moves_few_reviewers(clustered_rows):
+    session = make_session(clustered_rows())
+    rooms_by_person = session['incumbent']['rooms_by_person']
+    for rev in session['reviewers'][:10]:
+        for k, labels in enumerate(ROUND_ROOM_LABELS[:2]):
+            room = labels[1 - labels.index(rooms_by_person[rev][k])]
+            answer = pc_service.handle_what_if(session, {'pin': {rev: room}, 'csv': False})
+            assert answer['moved_people'][rev][1][k] == room
+            assert len(answer['moved_people']) <= 8, (rev, room)
+
+@pytest.mark.parametrize('request_', [{'pin': ['r1']}, {'pin': {'r1': ['A']}}, {'forbid': {'r1': 3}},
+                                      {'papers': 'p1'}, {'plenary': 'p1'}, {'tries': 1000}, {'tries': '2'},
+                                      {'seed': 1.5}, {'csv': 'no'}, {'keep': 1}])
+def test_bad_request_types_raise_value_error(request_):
+    with pytest.raises(ValueError):
+        pc_service.check_request_types(request_)
@@ -0,0 +1,13 @@
+import pc_rooms
+
+# Big runs on several workers still hand back small chunks of trials.
+def test_trial_chunks_are_capped():
+    assert pc_rooms.get_trial_chunk_size(100000, 3) == pc_rooms.MAX_TRIAL_CHUNK
+    assert pc_rooms.get_trial_chunk_size(40, 3) == 1
+    assert pc_rooms.get_trial_chunk_size(100000, 1) == 1
+
+# One round balances paper loads unless told otherwise.
+def test_one_round_balances_loads_by_default():
+    assert pc_rooms.get_trial_options({'rounds': 1})['load_balance'] == pc_rooms.LOAD_BALANCE_TOLERANCE
+    assert pc_rooms.get_trial_options({'rounds': 1, 'load_balance': 0.0})['load_balance'] == 0.0
+    assert pc_rooms.get_trial_options({'rounds': 2})['load_balance'] == 0.0
@@ -0,0 +1,43 @@
+import sys
+import random
+import pytest
+import pc_verify
+
+# The NumPy screen must report exactly what the plain-Python checks report,
+# including bad rooms, reviewers with no room and papers with no reviewers.
+
+ROOMS = ['AX', 'AY', 'BX', 'BY']
+BAD_ROOMS = ['AB', 'A', 'AXU', 'Q', '']
+PAPER_ROOMS = ['A', 'B', 'X', 'Y', 'P']
+BAD_PAPER_ROOMS = ['U', 'AX', '', 'Q']
+
+def make_case(rng):
+    people = [f'r{i}' for i in range(rng.randint(1, 12))]
+    people_rooms = {p: rng.choice(BAD_ROOMS if rng.random() < 0.1 else ROOMS) for p in people if rng.random() < 0.9}
+    papers = {}
+    for i in range(rng.randint(0, 20)):
+        papers[f'p{i}'] = tuple(rng.sample(people, min(rng.choice([0, 1, 2, 2, 2, 3]), len(people))))
+    paper_rooms = {}
+    for pid in list(papers) + ['p99']:
+        if rng.random() < 0.8:
+            paper_rooms[pid] = rng.choice(BAD_PAPER_ROOMS if rng.random() < 0.1 else PAPER_ROOMS)
+    return papers, paper_rooms, people_rooms
+
+def test_numpy_screen_matches_plain_checks(monkeypatch):
+    pytest.importorskip('numpy')
+    rng = random.Random(1)
+    cases = [(make_case(rng), rng.choice([None, 1, 2, 3])) for i in range(2000)]
+    with_numpy = [pc_verify.verify_room_assignments(*case, rounds=rounds) for case, rounds in cases]
+    monkeypatch.setitem(sys.modules, 'numpy', None) # import numpy now raises ImportError
+    without_numpy = [pc_verify.verify_room_assignments(*case, rounds=rounds) for case, rounds in cases]
+    assert with_numpy == without_numpy
+
+def test_reports_each_kind_of_violation():
+    papers = {'p1': ('r1', 'r2'), 'p2': ('r1', 'r3'), 'p3': ('r2', 'r4'), 'p4': ('r1', 'r2'), 'p5': ('r1', 'r2')}
+    paper_rooms = {'p1': 'P', 'p2': 'B', 'p3': 'A', 'p4': 'Q', 'p6': 'A'}
+    people_rooms = {'r1': 'AX', 'r2': 'AY', 'r3': 'BX'}
+    report = pc_verify.verify_room_assignments(papers, paper_rooms, people_rooms)
+    assert [(category, item) for category, item, msg in report['violations']] == [
+        ('bad_paper_room', 'p4'), ('missing_person', 'r4'), ('unknown_paper', 'p6'),
+        ('reviewer_not_in_room', 'p2'), ('avoidable_plenary', 'p1'), ('avoidable_plenary', 'p5')]
+    assert report['plenary'] == 2